@@ -0,0 +1,196 @@
+import argparse
+import json
+import math
+import multiprocessing
+import os
+import platform
+import sys
+import time
+import tracemalloc
+
+from benchmarks.cases import CASES
+from qsatlib.qsatlib import *
+from qsatlib.solver import BddSolver, BruteForceSolver, CaqeSolver, CegarSolver, QdpllSolver, CAQE_PATH
+
+SOLVERS = {
+    'brute_force': BruteForceSolver,
+    'qdpll': QdpllSolver,
+    'bdd': BddSolver,
+    'cegar': CegarSolver,
+    'caqe': CaqeSolver,
+}
+METRICS = 'build_seconds', 'nodes', 'quantified_bits', 'solve_seconds', 'peak_bytes'
+FITTED = 'nodes', 'quantified_bits', 'solve_seconds', 'peak_bytes'
+MIN_SECONDS = 0.01  # smaller timing differences are noise
+
+
+def _measure(case, solver, n, memory, connection):  # runs in a fresh process, so no caches carry over
+    try:
+        start = time.perf_counter()
+        formula = CASES[case][0](n)
+        build_seconds = time.perf_counter() - start
+        nodes, quantified_bits = 0, 0
+        for node in postorder(formula):
+            nodes += 1
+            if isinstance(node, QuantifierNode):
+                quantified_bits += len(node.variables)
+        if memory:
+            tracemalloc.start()
+        start = time.perf_counter()
+        result = SOLVERS[solver]().solve(formula)
+        solve_seconds = time.perf_counter() - start
+        connection.send(dict(case=case, solver=solver, n=n, result=result, build_seconds=build_seconds, nodes=nodes,
+                             quantified_bits=quantified_bits, solve_seconds=solve_seconds,
+                             peak_bytes=tracemalloc.get_traced_memory()[1] if memory else None))
+    except Exception as e:
+        connection.send(dict(case=case, solver=solver, n=n, error=f'{type(e).__name__}: {e}'))
+
+
+def _run_one(case, solver, n, memory, timeout):  # None on timeout
+    receiver, sender = multiprocessing.Pipe(duplex=False)
+    process = multiprocessing.Process(target=_measure, args=(case, solver, n, memory, sender))
+    process.start()
+    sender.close()
+    row = receiver.recv() if receiver.poll(timeout) else None
+    if process.is_alive():
+        process.terminate()
+    process.join()
+    return row
+
+
+def run(cases, solvers, timeout, memory, max_n=None):  # every case grows until a solver times out or fails
+    results = []
+    for case in cases:
+        _, sizes, expected = CASES[case]
+        for solver in solvers:
+            for n in sizes:
+                if max_n is not None and n > max_n:
+                    break
+                row = _run_one(case, solver, n, False, timeout)
+                if row is None:
+                    row = dict(case=case, solver=solver, n=n, error=f'timeout after {timeout} s')
+                elif 'error' not in row and memory:  # tracemalloc slows everything down, so it gets its own run
+                    peak = _run_one(case, solver, n, True, timeout)
+                    row['peak_bytes'] = peak.get('peak_bytes') if peak is not None else None
+                if 'error' not in row:
+                    row['correct'] = row['result'] == expected
+                results.append(row)
+                print(_format(row), flush=True)
+                if 'error' in row:
+                    break
+    return dict(python=platform.python_version(), machine=platform.machine(), results=results,
+                exponents=exponents(results))
+
+
+def _format(row):
+    prefix = f'{row["case"]:36} {row["solver"]:12} n={row["n"]:<3}'
+    if 'error' in row:
+        return f'{prefix} {row["error"]}'
+    peak = '' if row['peak_bytes'] is None else f' {row["peak_bytes"] / 2 ** 20:9.2f} MiB'
+    return (f'{prefix} {row["solve_seconds"]:9.3f} s {row["nodes"]:8} nodes {row["quantified_bits"]:5} quantified'
+            f'{peak}{"" if row["correct"] else " WRONG"}')
+
+
+def _slope(points):  # least squares
+    mean_x = sum(x for x, _ in points) / len(points)
+    mean_y = sum(y for _, y in points) / len(points)
+    variance = sum((x - mean_x) ** 2 for x, _ in points)
+    return sum((x - mean_x) * (y - mean_y) for x, y in points) / variance if variance else None
+
+
+def fit(points):  # y ~ n ** power and y ~ base ** n, from at least three positive points
+    points = [(n, y) for n, y in points if y]
+    if len(points) < 3:
+        return None
+    power = _slope([(math.log(n), math.log(y)) for n, y in points])
+    slope = _slope([(n, math.log(y)) for n, y in points])
+    return dict(power=power, base=math.exp(slope))
+
+
+def exponents(results):
+    series = dict()
+    for row in results:
+        if 'error' not in row:
+            series.setdefault(f'{row["case"]}/{row["solver"]}', []).append(row)
+    fits = dict()
+    for key, rows in series.items():
+        for metric in FITTED:
+            growth = fit([(row['n'], row[metric]) for row in rows if row[metric] is not None])
+            if growth is not None:
+                fits.setdefault(key, dict())[metric] = growth
+    return fits
+
+
+def compare(baseline, current, threshold):  # returns the number of regressions
+    regressions = 0
+    old_rows = {(row['case'], row['solver'], row['n']): row for row in baseline['results']}
+    for row in current['results']:
+        key = row['case'], row['solver'], row['n']
+        old = old_rows.get(key)
+        if old is None:
+            continue
+        name = f'{row["case"]} {row["solver"]} n={row["n"]}'
+        if 'error' in row or 'error' in old:
+            if 'error' in row and 'error' not in old:
+                regressions += 1
+                print(f'{name}: {row["error"]}')
+            elif 'error' in old and 'error' not in row:
+                print(f'{name}: fixed {old["error"]}')
+            continue
+        if row['correct'] != old['correct']:
+            regressions += not row['correct']
+            print(f'{name}: {"correct" if row["correct"] else "WRONG"} now')
+        for metric in METRICS:
+            before, after = old.get(metric), row.get(metric)
+            if not before or after is None:
+                continue
+            if metric.endswith('seconds') and abs(after - before) < MIN_SECONDS:
+                continue
+            ratio = after / before
+            if ratio > threshold or ratio < 1 / threshold:
+                regressions += ratio > threshold
+                print(f'{name} {metric}: {before:.6g} -> {after:.6g} ({ratio:.2f}x)')
+    for key, fits in current['exponents'].items():
+        for metric, growth in fits.items():
+            before = baseline['exponents'].get(key, dict()).get(metric)
+            if before is not None and abs(growth['base'] - before['base']) > 0.05 * before['base']:
+                print(f'{key} {metric}: growth base {before["base"]:.3f} -> {growth["base"]:.3f}, '
+                      f'power {before["power"]:.2f} -> {growth["power"]:.2f}')
+    return regressions
+
+
+def main(argv=None):
+    solvers = [solver for solver in SOLVERS if solver != 'caqe' or os.path.exists(CAQE_PATH)]
+    parser = argparse.ArgumentParser(prog='python -m benchmarks')
+    commands = parser.add_subparsers(dest='command', required=True)
+    run_parser = commands.add_parser('run', help='measure the cases and write the results as JSON')
+    run_parser.add_argument('--cases', nargs='+', choices=sorted(CASES), default=list(CASES))
+    run_parser.add_argument('--solvers', nargs='+', choices=sorted(SOLVERS), default=solvers)
+    run_parser.add_argument('--max-n', type=int, default=None)
+    run_parser.add_argument('--timeout', type=float, default=10, help='seconds per solve, larger n are skipped')
+    run_parser.add_argument('--no-memory', action='store_true', help='skip the tracemalloc runs')
+    run_parser.add_argument('--output', default='benchmark.json')
+    compare_parser = commands.add_parser('compare', help='report changes of current against baseline')
+    compare_parser.add_argument('baseline')
+    compare_parser.add_argument('current')
+    compare_parser.add_argument('--threshold', type=float, default=1.25, help='ratio counted as a change')
+    args = parser.parse_args(argv)
+    if args.command == 'run':
+        report = run(args.cases, args.solvers, args.timeout, not args.no_memory, args.max_n)
+        with open(args.output, 'w') as file:
+            json.dump(report, file, indent=1)
+        for key, fits in report['exponents'].items():
+            print(f'{key:50} ' + ' '.join(f'{metric} ~ n^{growth["power"]:.2f} ~ {growth["base"]:.2f}^n'
+                                         for metric, growth in fits.items() if metric == 'solve_seconds'))
+        return 0
+    with open(args.baseline) as file:
+        baseline = json.load(file)
+    with open(args.current) as file:
+        current = json.load(file)
+    regressions = compare(baseline, current, args.threshold)
+    print(f'{regressions} regressions')
+    return 1 if regressions else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
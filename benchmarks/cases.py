@@ -0,0 +1,101 @@
+from qsatlib.graphs import *
+from qsatlib.numbers import *
+
+
+def variable_uniqueness(n):
+    a = Variable(num_bits=n)
+    b = Variable(num_bits=n)
+    return forall(a, exist_unique(b, b == a))
+
+
+def unary_add_commutativity(n):
+    a = UIntUnary(num_bits=n)
+    b = UIntUnary(num_bits=n)
+    return forall(a, b, a + b == b + a)
+
+
+def unary_order_transitivity(n):
+    a = UIntUnary(num_bits=n)
+    b = UIntUnary(num_bits=n)
+    c = UIntUnary(num_bits=n)
+    return forall(a, b, c, implies((a < b) & (b < c), a < c))
+
+
+def binary_add_commutativity(n):
+    a = UIntBinary(num_bits=n)
+    b = UIntBinary(num_bits=n)
+    return forall(a, b, a + b == b + a)
+
+
+def binary_add_associativity(n):
+    a = UIntBinary(num_bits=n)
+    b = UIntBinary(num_bits=n)
+    c = UIntBinary(num_bits=n)
+    return forall(a, b, c, (a + b) + c == a + (b + c))
+
+
+def binary_odd_numbers(n):
+    a = UIntBinary(num_bits=n)
+    b = UIntBinary(num_bits=n)
+    return forall(a, exist(b, a == b + b))
+
+
+def binary_mul_commutativity(n):
+    a = UIntBinary(num_bits=n)
+    b = UIntBinary(num_bits=n)
+    return forall(a, b, a * b == b * a)
+
+
+def binary_minimum(n):
+    a = UIntBinary(num_bits=n)
+    b = UIntBinary(num_bits=n)
+    return exist(a, forall(b, b >= a))
+
+
+def binary_maximum(n):  # ∃∀ with the search in the outer block, where clause and cube learning beat enumeration
+    a = UIntBinary(num_bits=n)
+    b = UIntBinary(num_bits=n)
+    return exist(a, forall(b, b <= a))
+
+
+def digraph_absorption(n):
+    a = DirectedGraph(num_vertices=n)
+    b = DirectedGraph(num_vertices=n)
+    return forall(a, b, (a | (a & b)) == a)
+
+
+def digraph_intersection_commutativity(n):
+    a = DirectedGraph(num_vertices=n)
+    b = DirectedGraph(num_vertices=n)
+    return forall(a, b, (a & b) == (b & a))
+
+
+def digraph_union_associativity(n):
+    a = DirectedGraph(num_vertices=n)
+    b = DirectedGraph(num_vertices=n)
+    c = DirectedGraph(num_vertices=n)
+    return forall(a, b, c, ((a | b) | c) == (a | (b | c)))
+
+
+def graph_distributivity(n):
+    a = UndirectedGraph(num_vertices=n)
+    b = UndirectedGraph(num_vertices=n)
+    c = UndirectedGraph(num_vertices=n)
+    return forall(a, b, c, ((a | b) & c) == ((a & c) | (b & c)))
+
+
+CASES = {  # name -> (builder, sizes, expected result)
+    'variable_uniqueness': (variable_uniqueness, range(1, 9), True),
+    'unary_add_commutativity': (unary_add_commutativity, range(1, 9), True),
+    'unary_order_transitivity': (unary_order_transitivity, range(1, 7), True),
+    'binary_add_commutativity': (binary_add_commutativity, range(1, 9), True),
+    'binary_add_associativity': (binary_add_associativity, range(1, 7), True),
+    'binary_odd_numbers': (binary_odd_numbers, range(1, 9), False),
+    'binary_mul_commutativity': (binary_mul_commutativity, range(1, 7), True),
+    'binary_minimum': (binary_minimum, range(1, 9), True),
+    'binary_maximum': (binary_maximum, range(1, 17), True),
+    'digraph_intersection_commutativity': (digraph_intersection_commutativity, range(1, 5), True),
+    'digraph_union_associativity': (digraph_union_associativity, range(1, 5), True),
+    'digraph_absorption': (digraph_absorption, range(1, 17), True),
+    'graph_distributivity': (graph_distributivity, range(1, 6), True),
+}
@@ -0,0 +1,119 @@
+from array import array
+
+from qsatlib.qsatlib import *
+from qsatlib.qdimacs import prenex
+from qsatlib.error import *
+
+FALSE, TRUE = 0, 1  # literals of node 0
+
+
+class Aig:  # And-Inverter Graph, a literal is 2 * node + complement, inputs are nodes without fanins
+    def __init__(self):
+        self.lefts = array('I', [0])  # fanin literals of every node, in topological order
+        self.rights = array('I', [0])
+        self.table = array('I', [0]) * 16  # open addressing by fanins, at most 3/4 full, 0 marks a free slot
+        self.num_gates = 0
+        self.inputs = dict()  # bit id -> node
+        self.bit_ids = dict()  # node -> bit id
+        self.prefix = []  # (QuantifierType, array of input nodes), outermost first
+        self.outputs = array('I')
+
+    def __len__(self):
+        return len(self.lefts)
+
+    def input(self, bit_id):
+        node = self.inputs.get(bit_id)
+        if node is None:
+            node = self.inputs[bit_id] = len(self.lefts)
+            self.bit_ids[node] = bit_id
+            self.lefts.append(0)
+            self.rights.append(0)
+        return 2 * node
+
+    def is_gate(self, node):
+        return self.lefts[node] != 0
+
+    def and_(self, left, right):
+        if left > right:
+            left, right = right, left
+        if left == FALSE or left == right ^ 1:
+            return FALSE
+        if left == TRUE or left == right:
+            return right
+        slot = self._find(left, right)
+        node = self.table[slot]
+        if not node:
+            if len(self.lefts) >= 2 ** 31:
+                raise SuckError('AIG exceeds 2^31 nodes')
+            node = self.table[slot] = len(self.lefts)
+            self.lefts.append(left)
+            self.rights.append(right)
+            self.num_gates += 1
+            if 4 * self.num_gates > 3 * len(self.table):
+                self._grow()
+        return 2 * node
+
+    def _find(self, left, right):  # slot of the gate, or the free slot where it belongs
+        mask = len(self.table) - 1
+        slot = (left * 0x9E3779B1 ^ right * 0x85EBCA77) >> 7 & mask
+        while True:
+            node = self.table[slot]
+            if not node or self.lefts[node] == left and self.rights[node] == right:
+                return slot
+            slot = slot + 1 & mask
+
+    def _grow(self):
+        self.table = array('I', [0]) * (2 * len(self.table))
+        for node in range(1, len(self.lefts)):
+            if self.is_gate(node):
+                self.table[self._find(self.lefts[node], self.rights[node])] = node
+
+    def or_(self, left, right):
+        return self.and_(left ^ 1, right ^ 1) ^ 1
+
+    def xor(self, left, right):
+        return self.or_(self.and_(left, right ^ 1), self.and_(left ^ 1, right))
+
+    def evaluate(self, lit, values):  # values maps bit ids to bools
+        results = bytearray(lit // 2 + 1)
+        for node in range(1, lit // 2 + 1):
+            if self.is_gate(node):
+                left, right = self.lefts[node], self.rights[node]
+                results[node] = results[left >> 1] ^ (left & 1) and results[right >> 1] ^ (right & 1)
+            else:
+                results[node] = bool(values[self.bit_ids[node]])
+        return bool(results[lit >> 1] ^ (lit & 1))
+
+
+def to_aig(formula: Formula, aig=None):  # prenexes the formula, its matrix becomes the next output
+    aig = Aig() if aig is None else aig
+    blocks, matrix = prenex(formula)
+    aig.prefix = [(quantifier, array('I', [aig.input(bit.id) // 2 for bit in variables]))
+                  for quantifier, variables in blocks]
+    lits = dict()
+    for node in postorder(matrix):
+        if isinstance(node, BitNode):
+            lit = aig.input(node.id)
+        elif isinstance(node, ConstantNode):
+            lit = TRUE if node.value else FALSE
+        elif isinstance(node, OperationNode):
+            children = [lits[id(child)] for child in node.children]
+            if node.op_type == OperationType.NOT:
+                lit = children[0] ^ 1
+            elif node.op_type in (OperationType.AND, OperationType.OR):
+                lit = TRUE if node.op_type == OperationType.AND else FALSE
+                for child in children:
+                    lit = aig.and_(lit, child) if node.op_type == OperationType.AND else aig.or_(lit, child)
+            elif node.op_type == OperationType.XOR:
+                lit = FALSE
+                for child in children:
+                    lit = aig.xor(lit, child)
+            elif node.op_type == OperationType.EQ:
+                lit = aig.xor(children[0], children[1]) ^ 1
+            else:
+                raise SuckError(f'Unknown operation type {node.op_type}')
+        else:
+            raise SuckError(f'Unexpected node {node} in the prenex matrix')
+        lits[id(node)] = lit
+    aig.outputs.append(lits[id(matrix)])
+    return aig
@@ -0,0 +1,254 @@
+import sys
+
+from qsatlib.qsatlib import *
+from qsatlib.error import *
+
+FALSE, TRUE = 0, 1
+
+
+class Bdd:  # reduced ordered BDDs as integer node ids, nodes 0 and 1 are the terminals
+    def __init__(self, node_limit=None, cache_size=2**16, reordering=True):
+        self.node_limit = node_limit
+        self.reordering = reordering
+        self.vars = [0, 0]  # var 0 labels the terminals and sits below every level
+        self.lows = [FALSE, TRUE]
+        self.highs = [FALSE, TRUE]
+        self.refs = [0, 0]  # parent and root references, only kept up to date while sifting
+        self.levels = [sys.maxsize]
+        self.order = []  # var at each level
+        self.bit_ids = [None]
+        self.var_of = dict()
+        self.unique = dict()
+        self.cache = [None] * cache_size  # direct-mapped, a colliding entry evicts the previous one
+        self.cache_hits = 0
+        self.num_reorderings = 0
+        self.next_reordering = 4096
+
+    def variable(self, bit_id):  # new bits go below all others
+        if bit_id not in self.var_of:
+            self.var_of[bit_id] = len(self.bit_ids)
+            self.levels.append(len(self.order))
+            self.order.append(len(self.bit_ids))
+            self.bit_ids.append(bit_id)
+        return self._node(self.var_of[bit_id], FALSE, TRUE)
+
+    def _node(self, var, low, high):
+        if low == high:
+            return low
+        key = var, low, high
+        node = self.unique.get(key)
+        if node is None:
+            if self.node_limit is not None and len(self.unique) >= self.node_limit:
+                raise SuckError(f'BDD exceeds the limit of {self.node_limit} nodes')
+            node = len(self.vars)
+            self.vars.append(var)
+            self.lows.append(low)
+            self.highs.append(high)
+            self.refs.append(0)
+            self.unique[key] = node
+        return node
+
+    def _level(self, node):
+        return self.levels[self.vars[node]]
+
+    def _cofactors(self, node, var):
+        if self.vars[node] == var:
+            return self.lows[node], self.highs[node]
+        return node, node
+
+    def ite(self, f, g, h):
+        if f <= TRUE:
+            return g if f == TRUE else h
+        if g == h or g == TRUE and h == FALSE:
+            return g if g == h else f
+        key = f, g, h
+        slot = hash(key) % len(self.cache)
+        entry = self.cache[slot]
+        if entry is not None and entry[0] == key:
+            self.cache_hits += 1
+            return entry[1]
+        var = self.order[min(self._level(f), self._level(g), self._level(h))]
+        (f0, f1), (g0, g1), (h0, h1) = self._cofactors(f, var), self._cofactors(g, var), self._cofactors(h, var)
+        result = self._node(var, self.ite(f0, g0, h0), self.ite(f1, g1, h1))
+        self.cache[slot] = key, result
+        return result
+
+    def negate(self, f):
+        return self.ite(f, FALSE, TRUE)
+
+    def apply(self, op_type: OperationType, *operands):
+        if op_type == OperationType.NOT:
+            return self.negate(operands[0])
+        if op_type == OperationType.EQ:
+            return self.ite(operands[0], operands[1], self.negate(operands[1]))
+        result = TRUE if op_type == OperationType.AND else FALSE
+        for operand in operands:
+            if op_type == OperationType.AND:
+                result = self.ite(result, operand, FALSE)
+            elif op_type == OperationType.OR:
+                result = self.ite(result, TRUE, operand)
+            elif op_type == OperationType.XOR:
+                result = self.ite(result, self.negate(operand), operand)
+            else:
+                raise SuckError(f'Unknown operation type {op_type}')
+        return result
+
+    def quantify(self, quantifier: QuantifierType, bit_ids, f):
+        levels = sorted(self.levels[self.var_of[bit_id]] for bit_id in bit_ids if bit_id in self.var_of)
+        if quantifier == QuantifierType.EXISTS_UNIQUE:
+            if len(levels) < len(bit_ids):  # f does not depend on a bit, so solutions come in pairs
+                return FALSE
+            return self._unique(f, levels, dict(), dict())
+        if not levels:
+            return f
+        junction = OperationType.OR if quantifier == QuantifierType.EXISTS else OperationType.AND
+        return self._quantify(f, junction, set(levels), levels[-1], dict())
+
+    def _quantify(self, f, junction, levels, bottom, memo):
+        if self._level(f) > bottom:
+            return f
+        if f not in memo:
+            low = self._quantify(self.lows[f], junction, levels, bottom, memo)
+            high = self._quantify(self.highs[f], junction, levels, bottom, memo)
+            if self._level(f) in levels:
+                memo[f] = self.apply(junction, low, high)
+            else:
+                memo[f] = self._node(self.vars[f], low, high)
+        return memo[f]
+
+    def _unique(self, f, levels, memo, exists_memo, i=0):  # exactly one assignment of levels[i:] satisfies f
+        if i == len(levels):
+            return f
+        level = self._level(f)
+        if level > levels[i]:  # levels[i] is skipped, so the count is zero or even
+            return FALSE
+        key = f, i
+        if key not in memo:
+            low, high = self.lows[f], self.highs[f]
+            if level < levels[i]:
+                memo[key] = self._node(self.vars[f], self._unique(low, levels, memo, exists_memo, i),
+                                       self._unique(high, levels, memo, exists_memo, i))
+            else:
+                rest = exists_memo.setdefault(i, dict())
+                exists_low, exists_high = [self._quantify(g, OperationType.OR, set(levels[i + 1:]), levels[-1],
+                                                          rest) if i + 1 < len(levels) else g
+                                           for g in (low, high)]
+                memo[key] = self.ite(self._unique(low, levels, memo, exists_memo, i + 1),
+                                     self.negate(exists_high),
+                                     self.ite(exists_low, FALSE, self._unique(high, levels, memo, exists_memo,
+                                                                              i + 1)))
+        return memo[key]
+
+    def evaluate(self, f, values):  # values maps bit ids to bools
+        while f > TRUE:
+            f = self.highs[f] if values[self.bit_ids[self.vars[f]]] else self.lows[f]
+        return f == TRUE
+
+    def size(self, roots):
+        return len(self._reachable(roots))
+
+    def _reachable(self, roots):
+        visited, stack = set(), [root for root in roots if root > TRUE]
+        while stack:
+            node = stack.pop()
+            if node not in visited:
+                visited.add(node)
+                stack.extend(child for child in (self.lows[node], self.highs[node]) if child > TRUE)
+        return visited
+
+    def _collect(self, roots):  # drops unreachable nodes, empties the cache and counts references
+        reachable = self._reachable(roots)
+        self.unique = {key: node for key, node in self.unique.items() if node in reachable}
+        self.cache = [None] * len(self.cache)
+        self.refs = [0] * len(self.vars)
+        for node in reachable:
+            self.refs[self.lows[node]] += 1
+            self.refs[self.highs[node]] += 1
+        for root in roots:
+            self.refs[root] += 1
+        return len(reachable)
+
+    def _reference(self, node):
+        if node > TRUE:
+            if not self.refs[node]:  # just created
+                self.refs[self.lows[node]] += 1
+                self.refs[self.highs[node]] += 1
+            self.refs[node] += 1
+        return node
+
+    def _dereference(self, node):
+        stack = [node]
+        while stack:
+            node = stack.pop()
+            if node > TRUE:
+                self.refs[node] -= 1
+                if not self.refs[node]:
+                    del self.unique[self.vars[node], self.lows[node], self.highs[node]]
+                    stack += [self.lows[node], self.highs[node]]
+
+    def _swap(self, level):  # exchanges the vars at level and level + 1, node ids keep their functions
+        x, y = self.order[level], self.order[level + 1]
+        nodes = [node for key, node in self.unique.items() if key[0] == x]
+        self.order[level], self.order[level + 1] = y, x
+        self.levels[x], self.levels[y] = level + 1, level
+        for node in nodes:
+            f0, f1 = self.lows[node], self.highs[node]
+            if self.vars[f0] != y and self.vars[f1] != y:
+                continue
+            (f00, f01), (f10, f11) = self._cofactors(f0, y), self._cofactors(f1, y)
+            del self.unique[x, f0, f1]
+            low, high = self._reference(self._node(x, f00, f10)), self._reference(self._node(x, f01, f11))
+            self.vars[node], self.lows[node], self.highs[node] = y, low, high
+            self.unique[y, low, high] = node
+            self._dereference(f0)
+            self._dereference(f1)
+        return len(self.unique)
+
+    def sift(self, roots, max_growth=1.2):  # moves every var to the level that minimizes the node count
+        roots = list(roots)
+        node_limit, self.node_limit = self.node_limit, None
+        size = self._collect(roots)
+        counts = dict()
+        for var, _, _ in self.unique:
+            counts[var] = counts.get(var, 0) + 1
+        for var in sorted(counts, key=counts.get, reverse=True):
+            best_size, best_level = size, self.levels[var]
+            for step in (1, -1):  # down to the bottom, then up to the top
+                while 0 <= self.levels[var] + min(step, 0) and self.levels[var] + max(step, 0) < len(self.order):
+                    size = self._swap(self.levels[var] + min(step, 0))
+                    if size < best_size:
+                        best_size, best_level = size, self.levels[var]
+                    if size > max_growth * best_size:
+                        break
+            while self.levels[var] != best_level:
+                step = 1 if self.levels[var] < best_level else -1
+                size = self._swap(self.levels[var] + min(step, 0))
+        self.node_limit = node_limit
+        self.num_reorderings += 1
+        return size
+
+
+def to_bdd(bdd: Bdd, formula: Formula):  # sifts whenever the table has doubled since the last reordering
+    uses = dict()
+    for node in postorder(formula):
+        for child in children_of(node):
+            uses[id(child)] = uses.get(id(child), 0) + 1
+    results = dict()
+    for node in postorder(formula):
+        if isinstance(node, BitNode):
+            result = bdd.variable(node.id)
+        elif isinstance(node, ConstantNode):
+            result = TRUE if node.value else FALSE
+        elif isinstance(node, QuantifierNode):
+            result = bdd.quantify(node.quantifier, [variable.id for variable in node.variables],
+                                  results[id(node.child)])
+        else:
+            result = bdd.apply(node.op_type, *[results[id(child)] for child in node.children])
+        for child in children_of(node):
+            uses[id(child)] -= 1
+            if not uses[id(child)]:
+                del results[id(child)]
+        results[id(node)] = result
+        if bdd.reordering and len(bdd.unique) > bdd.next_reordering:
+            bdd.next_reordering = 2 * bdd.sift(results.values())
+    return results[id(formula)]
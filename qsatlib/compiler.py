@@ -0,0 +1,205 @@
+import weakref
+from functools import lru_cache
+
+from qsatlib.qsatlib import *
+from qsatlib.error import *
+
+MAX_TABLE_MEMORY = 2 ** 26  # bytes of all live truth tables, hash-consed nodes share them between formulas
+table_bits = 0  # of all live truth tables, a table is released with its node
+
+
+def _scalar_operand(node, names):
+    if isinstance(node, BitNode):
+        return f'a[{node.id}]'
+    if isinstance(node, ConstantNode):
+        return str(node.value)
+    return names[id(node)]
+
+
+def _scalar_expression(node, operands):
+    if node.op_type == OperationType.NOT:
+        return f'not {operands[0]}'
+    if node.op_type == OperationType.AND:
+        return ' and '.join(operands) or 'True'
+    if node.op_type == OperationType.OR:
+        return ' or '.join(operands) or 'False'
+    if node.op_type == OperationType.XOR:
+        return ' ^ '.join(operands) or 'False'
+    if node.op_type == OperationType.EQ:
+        return f'{operands[0]} == {operands[1]}'
+    raise SuckError(f'Unknown operation type {node.op_type}')
+
+
+def _vector_operand(node, names):
+    if isinstance(node, BitNode):
+        return f'a[{node.id}]'
+    if isinstance(node, ConstantNode):
+        return '-1' if node.value else '0'
+    return names[id(node)]
+
+
+def _vector_expression(node, operands):
+    if node.op_type == OperationType.NOT:
+        return f'~{operands[0]}'
+    if node.op_type == OperationType.AND:
+        return ' & '.join(operands) or '-1'
+    if node.op_type == OperationType.OR:
+        return ' | '.join(operands) or '0'
+    if node.op_type == OperationType.XOR:
+        return ' ^ '.join(operands) or '0'
+    if node.op_type == OperationType.EQ:
+        return f'~({operands[0]} ^ {operands[1]})'
+    raise SuckError(f'Unknown operation type {node.op_type}')
+
+
+def _tabulated(node):
+    return getattr(node, '_table', None) is not None
+
+
+def _stop_at_tables(node):
+    return () if _tabulated(node) else children_of(node)
+
+
+def _compile(formula, slot, operand, expression, tables=False):  # with tables, tabulated nodes are looked up
+    kernel = getattr(formula, slot, None)
+    if kernel is not None:
+        return kernel or None
+    expand = _stop_at_tables if tables else children_of
+    nodes = []
+    inputs = set()
+    uses = dict()
+    quantified = set()
+    for node in postorder(formula, expand):
+        if isinstance(node, QuantifierNode) or any(id(child) in quantified for child in expand(node)):
+            quantified.add(id(node))
+            setattr(node, slot, False)
+        elif isinstance(node, BitNode):
+            inputs.add(node.id)
+        elif isinstance(node, OperationNode):
+            nodes.append(node)
+            for child in expand(node):
+                uses[id(child)] = uses.get(id(child), 0) + 1
+    if id(formula) in quantified:
+        return None
+    lines = ['def kernel(a):']
+    names = dict()
+    free_names = []
+    namespace = dict()
+    for node in nodes:  # a local is reused once all parents of its node are computed
+        if tables and _tabulated(node):
+            table_inputs, namespace[f'T{len(namespace)}'] = node._table
+            inputs.update(table_inputs)
+            index = ' | '.join(f'a[{bit_id}] << {i}' for i, bit_id in enumerate(table_inputs)) or '0'
+            code = f'(T{len(namespace) - 1} >> ({index})) & 1'
+        else:
+            operands = [operand(child, names) for child in node.children]
+            for child in node.children:
+                uses[id(child)] -= 1
+                if not uses[id(child)] and id(child) in names:
+                    free_names.append(names[id(child)])
+            code = expression(node, operands)
+        names[id(node)] = free_names.pop() if free_names else f't{len(names)}'
+        lines.append(f'    {names[id(node)]} = {code}')
+    lines.append(f'    return {operand(formula, names)}')
+    exec('\n'.join(lines), namespace)
+    kernel = namespace['kernel']
+    kernel.inputs = tuple(sorted(inputs))
+    setattr(formula, slot, kernel)
+    return kernel
+
+
+def compile_formula(formula: Formula, vectorized=False):  # returns None for formulas with quantifiers
+    if vectorized:  # values are bitmasks over assignments, constants are 0 and -1 (all bits set)
+        return _compile(formula, '_vector_kernel', _vector_operand, _vector_expression)
+    return _compile(formula, '_kernel', _scalar_operand, _scalar_expression, tables=True)
+
+
+@lru_cache(maxsize=None)
+def truth_table_patterns(num_bits):  # i-th pattern has bit m set iff the i-th bit of m is set
+    full = (1 << (1 << num_bits)) - 1
+    return [full // ((1 << (2 << i)) - 1) * (((1 << (1 << i)) - 1) << (1 << i)) for i in range(num_bits)], full
+
+
+def _release_table(num_bits):
+    global table_bits
+    table_bits -= num_bits
+
+
+def tabulate(formula: Formula, max_support=16, max_memory=2 ** 22):  # returns the number of tabulated nodes
+    global table_bits
+    sizes, quantified = dict(), set()  # sizes count shared nodes once per use, as a recursive evaluator would
+    for node in postorder(formula):
+        children = children_of(node)
+        if isinstance(node, QuantifierNode) or any(id(child) in quantified for child in children):
+            quantified.add(id(node))
+        sizes[id(node)] = min(1 + sum(sizes[id(child)] for child in children), 2 ** 32)
+    budget, count = min(8 * max_memory, 8 * MAX_TABLE_MEMORY - table_bits), 0  # in table bits
+    visited, stack = set(), [formula]
+    while stack:  # top-down, so that only maximal subformulas get tables
+        node = stack.pop()
+        if id(node) in visited or _tabulated(node):
+            continue
+        visited.add(id(node))
+        if isinstance(node, OperationNode) and id(node) not in quantified:
+            support = free_variables(node)
+            if len(support) <= max_support and len(support) < sizes[id(node)] and 2 ** len(support) <= budget:
+                kernel = compile_formula(node, vectorized=True)
+                patterns, full = truth_table_patterns(len(kernel.inputs))
+                node._table = kernel.inputs, kernel(dict(zip(kernel.inputs, patterns))) & full
+                budget -= 2 ** len(support)
+                table_bits += 2 ** len(support)
+                weakref.finalize(node, _release_table, 2 ** len(support))
+                count += 1
+                continue
+        stack.extend(children_of(node))
+    return count
+
+
+def _rails(node, names):
+    if isinstance(node, BitNode):
+        return f'(a[{node.id}] == 1)', f'(a[{node.id}] == 0)'
+    if isinstance(node, ConstantNode):
+        return ('1', '0') if node.value else ('0', '1')
+    if isinstance(node, QuantifierNode):
+        return '0', '0'
+    return names[id(node)]
+
+
+def _skip_quantifiers(node):
+    return () if isinstance(node, QuantifierNode) else children_of(node)
+
+
+def compile_ternary(formula: Formula):  # Kleene evaluation of partial assignments, returns (is_true, is_false)
+    kernel = getattr(formula, '_ternary_kernel', None)
+    if kernel is not None:
+        return kernel
+    lines = ['def kernel(a):']
+    names = dict()
+    for node in postorder(formula, _skip_quantifiers):  # quantified subformulas are unknown
+        if not isinstance(node, OperationNode):
+            continue
+        rails = [_rails(child, names) for child in node.children]
+        if node.op_type == OperationType.NOT:
+            names[id(node)] = rails[0][1], rails[0][0]
+            continue
+        index = len(names)
+        if node.op_type == OperationType.AND:
+            lines.append(f'    t{index} = ' + (' & '.join(t for t, _ in rails) or '1'))
+            lines.append(f'    f{index} = ' + (' | '.join(f for _, f in rails) or '0'))
+        elif node.op_type == OperationType.OR:
+            lines.append(f'    t{index} = ' + (' | '.join(t for t, _ in rails) or '0'))
+            lines.append(f'    f{index} = ' + (' & '.join(f for _, f in rails) or '1'))
+        elif node.op_type in (OperationType.XOR, OperationType.EQ):
+            lines.append(f'    k{index} = ' + (' & '.join(f'({t} | {f})' for t, f in rails) or '1'))
+            lines.append(f'    p{index} = ' + ' ^ '.join(['0'] + [t for t, _ in rails] +
+                                                          (['1'] if node.op_type == OperationType.EQ else [])))
+            lines.append(f'    t{index} = k{index} & p{index}')
+            lines.append(f'    f{index} = k{index} & (1 ^ p{index})')
+        else:
+            raise SuckError(f'Unknown operation type {node.op_type}')
+        names[id(node)] = f't{index}', f'f{index}'
+    lines.append('    return {}, {}'.format(*_rails(formula, names)))
+    namespace = dict()
+    exec('\n'.join(lines), namespace)
+    formula._ternary_kernel = namespace['kernel']
+    return formula._ternary_kernel
@@ -113,18 +113,75 @@ class UIntBinary(Variable):
         result.constraint &= conj(*[result[i] == ~self[i] for i in range(n)])
         return result
 
+    @operation
+    def __sub__(self, other):  # modulo 2 ** n, like __add__
+        assert len(self) == len(other)
+        n = len(self)
+        result = UIntBinary(num_bits=n)
+        carry = Variable(num_bits=n + 1)
+        conditions = [~carry[0]]
+        for k in range(n):
+            conditions.append(UIntBinary._bit_sum_is(result[k], other[k], carry[k], self[k], carry[k + 1]))
+        result.constraint &= exist(carry, conj(*conditions))
+        return result
+
+    @staticmethod
+    def _divide(dividend, divisor):  # division by zero gives all ones and the dividend as remainder
+        n = len(dividend)
+        quotient = UIntBinary(num_bits=n)
+        remainder = UIntBinary(num_bits=n)
+        wide = [UIntBinary(num_bits=2 * n) for _ in range(4)]  # zero-extended, so that the product cannot overflow
+        extended = conj(*[w[i] == x[i] for w, x in zip(wide, (quotient, divisor, remainder, dividend))
+                          for i in range(2 * n)])
+        nonzero = disj(*[divisor[i] for i in range(n)])
+        constraint = exist(*wide, disj(conj(nonzero, extended, wide[0] * wide[1] + wide[2] == wide[3],
+                                            remainder < divisor),
+                                       conj(~nonzero, *[quotient[i] for i in range(n)], remainder == dividend)))
+        return quotient, remainder, constraint
+
+    @operation
+    def __floordiv__(self, other):
+        assert len(self) == len(other)
+        quotient, remainder, constraint = UIntBinary._divide(self, other)
+        quotient.constraint &= exist(remainder, constraint)
+        return quotient
+
+    @operation
+    def __mod__(self, other):
+        assert len(self) == len(other)
+        quotient, remainder, constraint = UIntBinary._divide(self, other)
+        remainder.constraint &= exist(quotient, constraint)
+        return remainder
+
+    @operation
+    def __lshift__(self, shift: int):
+        n = len(self)
+        result = UIntBinary(num_bits=n)
+        result.constraint &= conj(*[result[i] == self[i - shift] for i in range(n)])
+        return result
+
+    @operation
+    def __rshift__(self, shift: int):
+        n = len(self)
+        result = UIntBinary(num_bits=n)
+        result.constraint &= conj(*[result[i] == self[i + shift] for i in range(n)])
+        return result
+
+    @staticmethod
+    def _compare(a, b, strict):  # ripple from the lowest bit, each higher bit decides unless equal
+        assert len(a) == len(b)
+        result = ConstantNode(not strict)
+        for i in range(len(a)):
+            result = disj(~a[i] & b[i], (a[i] == b[i]) & result)
+        return result
+
     @relation
     def __le__(self, other):
-        return (self < other) | (self == other)
+        return UIntBinary._compare(self, other, strict=False)
 
     @relation
     def __lt__(self, other):
-        assert len(self) == len(other)
-        options = []
-        for i in range(len(self)):
-            options.append(conj(~self[i], other[i],
-                                *[self[j] == other[j] for j in range(i + 1, len(self))]))
-        return disj(*options)
+        return UIntBinary._compare(self, other, strict=True)
 
     @relation
     def __ge__(self, other):
@@ -0,0 +1,415 @@
+import logging
+import random
+from collections import deque
+
+from qsatlib.qsatlib import *
+from qsatlib.qdimacs import Tseitin
+from qsatlib.sat import SatSolver
+
+logger = logging.getLogger(__name__)
+
+
+def node_count(formula: Formula):
+    return sum(1 for _ in postorder(formula))
+
+
+def conjuncts(formula: Formula):
+    result, stack = [], [formula]
+    while stack:
+        node = stack.pop()
+        if isinstance(node, OperationNode) and node.op_type == OperationType.AND:
+            stack.extend(reversed(node.children))
+        else:
+            result.append(node)
+    return result
+
+
+def _definition(conjunct, block):  # (bit id, value) if the conjunct forces a bit of the block to a value
+    if isinstance(conjunct, BitNode) and conjunct.id in block:
+        return conjunct.id, ConstantNode(True)
+    if isinstance(conjunct, OperationNode) and conjunct.op_type == OperationType.NOT and \
+            isinstance(conjunct.children[0], BitNode) and conjunct.children[0].id in block:
+        return conjunct.children[0].id, ConstantNode(False)
+    if isinstance(conjunct, OperationNode) and conjunct.op_type == OperationType.EQ:
+        for bit, value in (conjunct.children, reversed(conjunct.children)):
+            if isinstance(bit, OperationNode) and bit.op_type == OperationType.NOT:
+                bit, value = bit.children[0], ~value
+            if isinstance(bit, BitNode) and bit.id in block and bit.id not in free_variables(value):
+                return bit.id, value
+    return None
+
+
+def _reaches(starts, target, dependencies):
+    visited, stack = set(), list(starts)
+    while stack:
+        bit_id = stack.pop()
+        if bit_id == target:
+            return True
+        if bit_id not in visited and bit_id in dependencies:
+            visited.add(bit_id)
+            stack.extend(dependencies[bit_id])
+    return False
+
+
+def _eliminate_block(quantifier, variables, child):  # ∃x (x = e ∧ φ(x)) == φ(e) if x does not occur in e
+    block = {variable.id for variable in variables}
+    definitions, dependencies, remaining = dict(), dict(), []
+    for conjunct in conjuncts(child):
+        definition = _definition(conjunct, block)
+        if definition is not None and definition[0] not in definitions:
+            bit_id, value = definition
+            uses = [other for other in free_variables(value) if other in block]
+            if not _reaches(uses, bit_id, dependencies):
+                definitions[bit_id] = value
+                dependencies[bit_id] = uses
+                continue
+        remaining.append(conjunct)
+    if not definitions:
+        return QuantifierNode(quantifier, variables, child)
+    resolved = dict()
+    for bit_id in definitions:  # definitions are substituted into each other in topological order
+        stack = [bit_id]
+        while stack:
+            current = stack[-1]
+            pending = [other for other in dependencies[current] if other in definitions and other not in resolved]
+            if current in resolved:
+                stack.pop()
+            elif pending:
+                stack.extend(pending)
+            else:
+                mapping = {other: resolved[other] for other in dependencies[current] if other in resolved}
+                resolved[current] = substitute(definitions[current], mapping, rename=False)
+                stack.pop()
+    child = substitute(conj(*remaining), resolved, rename=False)
+    variables = [variable for variable in variables if variable.id not in definitions]
+    return QuantifierNode(quantifier, variables, child) if variables else child
+
+
+def eliminate_definitions(formula: Formula):
+    copies = dict()
+    for node in postorder(formula):
+        if isinstance(node, OperationNode):
+            copy = OperationNode(node.op_type, *[copies[id(child)] for child in node.children])
+        elif isinstance(node, QuantifierNode):
+            child = copies[id(node.child)]
+            if node.quantifier in (QuantifierType.EXISTS, QuantifierType.EXISTS_UNIQUE):
+                copy = _eliminate_block(node.quantifier, node.variables, child)
+            else:
+                copy = QuantifierNode(node.quantifier, node.variables, child)
+        else:
+            copy = node
+        copies[id(node)] = inherit_provenance(copy, node)
+    return copies[id(formula)]
+
+
+def _is_not(node):
+    return isinstance(node, OperationNode) and node.op_type == OperationType.NOT
+
+
+def _negate(node):
+    if isinstance(node, ConstantNode):
+        return ConstantNode(not node.value)
+    return node.children[0] if _is_not(node) else ~node
+
+
+def _simplify_junction(op_type, children):  # AND or OR
+    unit = op_type == OperationType.AND
+    dual = OperationType.OR if unit else OperationType.AND
+    unique, seen, stack = [], set(), list(reversed(children))
+    while stack:
+        child = stack.pop()
+        if isinstance(child, OperationNode) and child.op_type == op_type:
+            stack.extend(reversed(child.children))
+        elif isinstance(child, ConstantNode):
+            if child.value != unit:
+                return child
+        elif id(child) not in seen:
+            seen.add(id(child))
+            unique.append(child)
+    if any(_is_not(child) and id(child.children[0]) in seen for child in unique):  # x ∧ ¬x
+        return ConstantNode(not unit)
+    unique = [child for child in unique  # x ∧ (x ∨ y) == x
+              if not (isinstance(child, OperationNode) and child.op_type == dual and
+                      any(id(other) in seen for other in child.children))]
+    if len(unique) <= 1:
+        return unique[0] if unique else ConstantNode(unit)
+    return OperationNode(op_type, *unique)
+
+
+def _simplify_xor(children):
+    parity, odd, stack = False, dict(), list(reversed(children))
+    while stack:
+        child = stack.pop()
+        if _is_not(child):
+            parity = not parity
+            stack.append(child.children[0])
+        elif isinstance(child, OperationNode) and child.op_type == OperationType.XOR:
+            stack.extend(reversed(child.children))
+        elif isinstance(child, ConstantNode):
+            parity ^= child.value
+        elif id(child) in odd:  # x ⊕ x == 0
+            del odd[id(child)]
+        else:
+            odd[id(child)] = child
+    remaining = list(odd.values())
+    if not remaining:
+        return ConstantNode(parity)
+    result = remaining[0] if len(remaining) == 1 else OperationNode(OperationType.XOR, *remaining)
+    return ~result if parity else result
+
+
+def _simplify_eq(children):
+    if len(children) != 2:
+        return OperationNode(OperationType.EQ, *children)
+    left, right = children
+    if isinstance(left, ConstantNode):
+        left, right = right, left
+    if left is right:
+        return ConstantNode(True)
+    if isinstance(right, ConstantNode):
+        return left if right.value else _negate(left)
+    if _is_not(left) and left.children[0] is right or _is_not(right) and right.children[0] is left:
+        return ConstantNode(False)
+    if _is_not(left) and _is_not(right):
+        return left.children[0] == right.children[0]
+    return left == right
+
+
+def _simplify_quantifier(quantifier, variables, child):
+    if not variables:
+        return child
+    if isinstance(child, ConstantNode):  # ∃! has either none or at least two assignments
+        return ConstantNode(False) if quantifier == QuantifierType.EXISTS_UNIQUE else child
+    return QuantifierNode(quantifier, variables, child)
+
+
+def _unsimplified(node):
+    return () if getattr(node, '_simplified', None) is not None else children_of(node)
+
+
+def _simplify_pass(formula):
+    for node in postorder(formula, _unsimplified):
+        if getattr(node, '_simplified', None) is not None:
+            continue
+        if isinstance(node, QuantifierNode):
+            result = _simplify_quantifier(node.quantifier, node.variables, node.child._simplified)
+        elif isinstance(node, OperationNode):
+            children = [child._simplified for child in node.children]
+            if node.op_type == OperationType.NOT:
+                result = _negate(children[0])
+            elif node.op_type in (OperationType.AND, OperationType.OR):
+                result = _simplify_junction(node.op_type, children)
+            elif node.op_type == OperationType.XOR:
+                result = _simplify_xor(children)
+            else:
+                result = _simplify_eq(children)
+        else:
+            result = node
+        node._simplified = inherit_provenance(result, node)
+    return formula._simplified
+
+
+def simplify(formula: Formula):
+    before = node_count(formula) if logger.isEnabledFor(logging.INFO) else None
+    while True:
+        simplified = _simplify_pass(formula)
+        if simplified is formula:
+            break
+        formula = simplified
+    if before is not None:
+        logger.info('simplified %d nodes to %d', before, node_count(formula))
+    return formula
+
+
+def _flip(quantifier):
+    return QuantifierType.FORALL if quantifier == QuantifierType.EXISTS else QuantifierType.EXISTS
+
+
+def _operands(op_type, formula):  # flattened operands of ∧ or ∨, pushing ¬ through the dual junction
+    dual = OperationType.OR if op_type == OperationType.AND else OperationType.AND
+    result, stack = [], [(formula, False)]
+    while stack:
+        node, negated = stack.pop()
+        if isinstance(node, OperationNode) and node.op_type == (dual if negated else op_type):
+            stack.extend((child, negated) for child in reversed(node.children))
+        elif _is_not(node) and isinstance(node.children[0], OperationNode) and \
+                node.children[0].op_type == (op_type if negated else dual):
+            stack.append((node.children[0], not negated))
+        else:
+            result.append(_negate(node) if negated else node)
+    return result
+
+
+def _components(variables, operands):  # groups of operands connected by shared bits of the block
+    parent = {variable.id: variable.id for variable in variables}
+
+    def find(bit_id):
+        while parent[bit_id] != bit_id:
+            parent[bit_id] = parent[parent[bit_id]]
+            bit_id = parent[bit_id]
+        return bit_id
+
+    used = []
+    for operand in operands:
+        used.append([bit_id for bit_id in free_variables(operand) if bit_id in parent])
+        for bit_id in used[-1][1:]:
+            parent[find(bit_id)] = find(used[-1][0])
+    groups = dict()
+    for operand, bits in zip(operands, used):
+        if bits:
+            groups.setdefault(find(bits[0]), []).append(operand)
+    return [([variable for variable in variables if find(variable.id) == root], group)
+            for root, group in groups.items()], [operand for operand, bits in zip(operands, used) if not bits]
+
+
+def _push(quantifier, variables, child):  # moves a ∃ or ∀ block as deep into child as possible
+    support = free_variables(child)
+    variables = [variable for variable in variables if variable.id in support]
+    if not variables:
+        return child
+    if _is_not(child):
+        return _negate(_push(_flip(quantifier), variables, child.children[0]))
+    if isinstance(child, QuantifierNode) and child.quantifier == quantifier:
+        return _push(quantifier, variables + list(child.variables), child.child)
+    if isinstance(child, OperationNode) and child.op_type in (OperationType.AND, OperationType.OR):
+        operands = _operands(child.op_type, child)
+        if (quantifier == QuantifierType.EXISTS) == (child.op_type == OperationType.OR):  # ∃ over ∨, ∀ over ∧
+            return OperationNode(child.op_type, *[_push(quantifier, variables, operand) for operand in operands])
+        groups, outside = _components(variables, operands)
+        parts = outside + [_push(quantifier, block, group[0]) if len(group) == 1 else
+                           QuantifierNode(quantifier, block, OperationNode(child.op_type, *group))
+                           for block, group in groups]
+        return parts[0] if len(parts) == 1 else OperationNode(child.op_type, *parts)
+    return QuantifierNode(quantifier, variables, child)
+
+
+def miniscope(formula: Formula):
+    copies = dict()
+    for node in postorder(formula):
+        if isinstance(node, OperationNode):
+            copy = OperationNode(node.op_type, *[copies[id(child)] for child in node.children])
+        elif isinstance(node, QuantifierNode):
+            child = copies[id(node.child)]
+            if node.quantifier != QuantifierType.EXISTS_UNIQUE:
+                copy = _push(node.quantifier, list(node.variables), child)
+            elif all(variable.id in free_variables(child) for variable in node.variables):
+                copy = QuantifierNode(node.quantifier, node.variables, child)
+            else:  # an unused bit doubles the number of solutions
+                copy = ConstantNode(False)
+        else:
+            copy = node
+        copies[id(node)] = inherit_provenance(copy, node)
+    return copies[id(formula)]
+
+
+def _signature(node, signatures, full):
+    values = [signatures[id(child)] for child in node.children]
+    if node.op_type == OperationType.NOT:
+        return full ^ values[0]
+    if node.op_type == OperationType.AND:
+        result = full
+        for value in values:
+            result &= value
+        return result
+    if node.op_type == OperationType.OR:
+        result = 0
+        for value in values:
+            result |= value
+        return result
+    if node.op_type == OperationType.XOR:
+        result = 0
+        for value in values:
+            result ^= value
+        return result
+    return full ^ values[0] ^ values[1]
+
+
+def sweep(formula: Formula, width=64, max_conflicts=100, seed=0):  # merges quantifier-free nodes proven equivalent
+    quantified, nodes, roots = set(), [], []
+    for node in postorder(formula):
+        if isinstance(node, QuantifierNode) or any(id(child) in quantified for child in children_of(node)):
+            quantified.add(id(node))
+            roots += [child for child in children_of(node) if id(child) not in quantified]
+        else:
+            nodes.append(node)
+    if id(formula) not in quantified:
+        roots.append(formula)
+    rng, full = random.Random(seed), (1 << width) - 1
+    signatures = dict()  # values under width random assignments at once
+    for node in nodes:
+        if isinstance(node, BitNode):
+            signatures[id(node)] = rng.getrandbits(width)
+        elif isinstance(node, ConstantNode):
+            signatures[id(node)] = full if node.value else 0
+        else:
+            signatures[id(node)] = _signature(node, signatures, full)
+    solver, tseitin = SatSolver(), Tseitin(dict())
+    for root in roots:
+        for clause in tseitin.encode(root):
+            solver.add_clause(clause)
+    while solver.num_vars < tseitin.num_vars:  # bits directly below quantifiers occur in no clause
+        solver.new_var()
+    false = ConstantNode(False)
+    signatures[id(false)] = 0
+
+    def value(model, node):
+        if node is false:
+            return False
+        lit = tseitin.literal(node)
+        return model[abs(lit)] != (lit < 0)
+
+    classes = {0: [false]}  # signature up to complement -> candidates for merging, earliest first
+    merged = dict()  # id(node) -> (node it equals, complemented)
+    models = deque(maxlen=width)  # counterexamples of failed proofs refine the signatures
+    for node in nodes:
+        if not isinstance(node, OperationNode):
+            continue
+        signature = signatures[id(node)]
+        key = full ^ signature if signature & 1 else signature
+        candidates = classes.setdefault(key, [])
+        support = free_variables(node)
+        for other in candidates:
+            complemented = (signature ^ signatures[id(other)]) & 1 == 1
+            if not free_variables(other) <= support or \
+                    any(value(model, node) == (value(model, other) == complemented) for model in models):
+                continue
+            lit = tseitin.literal(node)
+            if other is false:
+                checks = [[-lit if complemented else lit]]
+            else:
+                other_lit = -tseitin.literal(other) if complemented else tseitin.literal(other)
+                checks = [[lit, -other_lit], [-lit, other_lit]]
+            for assumptions in checks:
+                result = solver.solve(assumptions, max_conflicts)
+                if result:
+                    models.append(solver.model)
+                if result is not False:
+                    break
+            else:
+                merged[id(node)] = other, complemented
+                break
+        else:
+            candidates.append(node)
+    if not merged:
+        return formula
+    copies = {id(false): false}
+    for node in postorder(formula):
+        if id(node) in merged:
+            other, complemented = merged[id(node)]
+            copy = ~copies[id(other)] if complemented else copies[id(other)]
+        elif isinstance(node, OperationNode):
+            copy = OperationNode(node.op_type, *[copies[id(child)] for child in node.children])
+        elif isinstance(node, QuantifierNode):
+            copy = QuantifierNode(node.quantifier, node.variables, copies[id(node.child)])
+        else:
+            copy = node
+        copies[id(node)] = inherit_provenance(copy, node)
+    logger.info('swept %d nodes into equivalent ones', len(merged))
+    return copies[id(formula)]
+
+
+def preprocess(formula: Formula, sweeping=False):  # sweeping pays off on large formulas only
+    formula = simplify(formula)
+    if sweeping:
+        formula = simplify(sweep(formula))
+    return simplify(miniscope(eliminate_definitions(formula)))
@@ -0,0 +1,239 @@
+from qsatlib.qsatlib import *
+from qsatlib.error import *
+
+
+def _flip(quantifier):
+    return QuantifierType.FORALL if quantifier == QuantifierType.EXISTS else QuantifierType.EXISTS
+
+
+def _quantified_nodes(formula):
+    result = set()
+    for node in postorder(formula):
+        if isinstance(node, QuantifierNode) or any(id(child) in result for child in children_of(node)):
+            result.add(id(node))
+    return result
+
+
+def _fresh(formula):
+    if _quantified_nodes(formula):
+        return substitute(formula, dict())
+    return formula
+
+
+def _eliminate(formula):  # rewrites ∃! and quantifiers below ⊕ and = in terms of ∃, ∀, ¬, ∧, ∨
+    quantified = _quantified_nodes(formula)
+    copies = dict()
+    for node in postorder(formula):
+        if id(node) not in quantified:
+            copy = node
+        elif isinstance(node, QuantifierNode):
+            child = copies[id(node.child)]
+            if node.quantifier == QuantifierType.EXISTS_UNIQUE:
+                others = [BitNode() for _ in node.variables]
+                renamed = substitute(child, {variable.id: other for variable, other in zip(node.variables, others)})
+                child = child & QuantifierNode(QuantifierType.FORALL, others, implies(
+                    renamed, conj(*[variable == other for variable, other in zip(node.variables, others)])))
+                copy = QuantifierNode(QuantifierType.EXISTS, node.variables, child)
+            else:
+                copy = QuantifierNode(node.quantifier, node.variables, child)
+        else:
+            children = [copies[id(child)] for child in node.children]
+            if node.op_type == OperationType.EQ:
+                left, right = children
+                copy = (left & right) | (~_fresh(left) & ~_fresh(right))
+            elif node.op_type == OperationType.XOR:
+                copy = children[0]
+                for child in children[1:]:
+                    copy = (copy & ~child) | (~_fresh(copy) & _fresh(child))
+            else:
+                copy = OperationNode(node.op_type, *children)
+        copies[id(node)] = copy
+    return copies[id(formula)]
+
+
+def _concat(first, second):
+    if first and second and first[-1][0] == second[0][0]:
+        return first[:-1] + [(first[-1][0], first[-1][1] + second[0][1])] + second[1:]
+    return first + second
+
+
+def _interleave(prefixes, quantifier):
+    positions = [0] * len(prefixes)
+    result = []
+    while any(position < len(prefix) for position, prefix in zip(positions, prefixes)):
+        block = []
+        for i, prefix in enumerate(prefixes):
+            if positions[i] < len(prefix) and prefix[positions[i]][0] == quantifier:
+                block += prefix[positions[i]][1]
+                positions[i] += 1
+        if block:
+            result.append((quantifier, block))
+        quantifier = _flip(quantifier)
+    return result
+
+
+def _merge(prefixes):
+    prefixes = [prefix for prefix in prefixes if prefix]
+    if len(prefixes) <= 1:
+        return prefixes[0] if prefixes else []
+    return min([_interleave(prefixes, QuantifierType.EXISTS),
+                _interleave(prefixes, QuantifierType.FORALL)], key=len)
+
+
+def prenex(formula: Formula):  # renamed and auxiliary bits come from a fresh context, whatever the current one is
+    with fresh_context(formula):
+        return _prenex(_eliminate(formula))
+
+
+def _prenex(formula):
+    quantified = _quantified_nodes(formula)
+    bound = set()
+    renamed = []  # keeps renamed copies alive, quantified is keyed by id()
+    results = []
+    stack = [(formula, True, False)]
+    while stack:
+        node, positive, expanded = stack.pop()
+        if not expanded:
+            if id(node) not in quantified:
+                results.append(([], node))
+                continue
+            if isinstance(node, QuantifierNode):
+                if any(variable.id in bound for variable in node.variables):
+                    node = substitute(node, dict())
+                    renamed.append(node)
+                    quantified |= _quantified_nodes(node)
+                bound.update(variable.id for variable in node.variables)
+            stack.append((node, positive, True))
+            for child in reversed(children_of(node)):
+                flip = isinstance(node, OperationNode) and node.op_type == OperationType.NOT
+                stack.append((child, positive != flip, False))
+            continue
+        if isinstance(node, QuantifierNode):
+            blocks, matrix = results.pop()
+            quantifier = node.quantifier if positive else _flip(node.quantifier)
+            if node.variables:
+                blocks = _concat([(quantifier, list(node.variables))], blocks)
+            results.append((blocks, matrix))
+        elif node.op_type in (OperationType.NOT, OperationType.AND, OperationType.OR):
+            parts = results[len(results) - len(node.children):]
+            del results[len(results) - len(node.children):]
+            results.append((_merge([blocks for blocks, _ in parts]),
+                            OperationNode(node.op_type, *[matrix for _, matrix in parts])))
+        else:
+            raise SuckError(f'Unexpected operation {node.op_type} above quantifiers')
+    blocks, matrix = results.pop()
+    free = [node for node in postorder(matrix) if isinstance(node, BitNode) and node.id not in bound]
+    if free:
+        blocks = _concat([(QuantifierType.EXISTS, free)], blocks)
+    return blocks, matrix
+
+
+class Tseitin:
+    def __init__(self, variables, num_vars=None):
+        self.variables = variables
+        self.num_vars = len(variables) if num_vars is None else num_vars
+        self.literals = dict()
+        self.nodes = []
+        self.gates = dict()  # var -> (AND or XOR, input literals) of the auxiliary vars
+        self.true = None
+
+    def new_var(self):
+        self.num_vars += 1
+        return self.num_vars
+
+    def literal(self, formula: Formula):
+        return self.literals[id(formula)]
+
+    def _constant(self, value):
+        if self.true is None:
+            self.true = self.new_var()
+            self.gates[self.true] = OperationType.AND, []
+            yield [self.true]
+        return self.true if value else -self.true
+
+    def encode(self, formula: Formula):
+        for node in postorder(formula):
+            if id(node) in self.literals:
+                continue
+            if isinstance(node, BitNode):
+                if node.id not in self.variables:
+                    self.variables[node.id] = self.new_var()
+                literal = self.variables[node.id]
+            elif isinstance(node, ConstantNode):
+                literal = yield from self._constant(node.value)
+            elif isinstance(node, OperationNode):
+                inputs = [self.literals[id(child)] for child in node.children]
+                if node.op_type == OperationType.NOT:
+                    literal = -inputs[0]
+                elif node.op_type in (OperationType.AND, OperationType.OR):
+                    if node.op_type == OperationType.OR:  # x1 ∨ ... ∨ xn == ¬(¬x1 ∧ ... ∧ ¬xn)
+                        inputs = [-x for x in inputs]
+                    if not inputs:
+                        literal = yield from self._constant(True)
+                    elif len(inputs) == 1:
+                        literal = inputs[0]
+                    else:
+                        literal = self.new_var()
+                        self.gates[literal] = OperationType.AND, inputs
+                        for x in inputs:
+                            yield [-literal, x]
+                        yield [literal] + [-x for x in inputs]
+                    if node.op_type == OperationType.OR:
+                        literal = -literal
+                elif node.op_type in (OperationType.XOR, OperationType.EQ):
+                    if node.op_type == OperationType.EQ:
+                        inputs = [inputs[0], -inputs[1]]
+                    if not inputs:
+                        literal = yield from self._constant(False)
+                    else:
+                        literal = inputs[0]
+                        for x in inputs[1:]:
+                            y = self.new_var()
+                            self.gates[y] = OperationType.XOR, [literal, x]
+                            yield from ([-y, literal, x], [-y, -literal, -x], [y, -literal, x], [y, literal, -x])
+                            literal = y
+                else:
+                    raise SuckError(f'Unknown operation type {node.op_type}')
+            elif isinstance(node, QuantifierNode):
+                raise SuckError(f'{node} is not quantifier-free')
+            else:
+                raise SuckError(f'Unknown node type {type(node)}')
+            self.literals[id(node)] = literal
+            self.nodes.append(node)
+
+
+class QdimacsEncoding:
+    def __init__(self, formula: Formula):
+        blocks, self.matrix = prenex(formula)
+        self.variables = dict()
+        for _, variables in blocks:
+            for variable in variables:
+                self.variables[variable.id] = len(self.variables) + 1
+        self.prefix = [(quantifier, [self.variables[variable.id] for variable in variables])
+                       for quantifier, variables in blocks]
+        tseitin = Tseitin(dict(self.variables))
+        self.num_clauses = sum(1 for _ in tseitin.encode(self.matrix)) + 1
+        self.num_vars = tseitin.num_vars
+        self.gates = tseitin.gates
+        auxiliary = list(range(len(self.variables) + 1, self.num_vars + 1))
+        if auxiliary:
+            self.prefix = _concat(self.prefix, [(QuantifierType.EXISTS, auxiliary)])
+
+    def clauses(self):
+        tseitin = Tseitin(dict(self.variables))
+        yield from tseitin.encode(self.matrix)
+        yield [tseitin.literal(self.matrix)]
+
+    def write(self, stream):
+        stream.write(f'p cnf {self.num_vars} {self.num_clauses}\n')
+        for quantifier, variables in self.prefix:
+            stream.write('e ' if quantifier == QuantifierType.EXISTS else 'a ')
+            stream.write(' '.join(map(str, variables)) + ' 0\n')
+        for clause in self.clauses():
+            stream.write(' '.join(map(str, clause)) + ' 0\n')
+
+
+def to_qdimacs(formula: Formula, stream):
+    encoding = QdimacsEncoding(formula)
+    encoding.write(stream)
+    return encoding
@@ -0,0 +1,319 @@
+from collections import defaultdict
+
+from qsatlib.qsatlib import OperationType, QuantifierType
+
+CLAUSE, CUBE = 0, 1  # learned cubes are stored negated, as clauses of the universal player
+SATISFIED, OPEN, UNIT, CONFLICT = range(4)
+
+
+class Qdpll:  # QCDCL on a prenex CNF: watched literals, universal/existential reduction, clause and cube learning
+    def __init__(self, num_vars, prefix, clauses, gates=None, max_learned=2000):  # gates as in Tseitin.gates
+        self.qlevels = [0] * (num_vars + 1)
+        self.universal = [False] * (num_vars + 1)
+        self.order = []
+        for depth, (quantifier, variables) in enumerate(prefix):
+            for var in variables:
+                self.qlevels[var] = depth
+                self.universal[var] = quantifier == QuantifierType.FORALL
+                self.order.append(var)
+        self.values = [None] * (num_vars + 1)
+        self.levels = [0] * (num_vars + 1)
+        self.reasons = [None] * (num_vars + 1)
+        self.positions = [0] * (num_vars + 1)
+        self.phases = [False] * (num_vars + 1)
+        self.trail = []
+        self.trail_limits = []
+        self.head = 0
+        self.next_index = 0
+        self.constraints = []  # deleted learned constraints become None
+        self.kinds = []
+        self.watched = []
+        self.watches = defaultdict(list)
+        self.learned = []  # (lbd, index) of learned clauses and cubes
+        self.max_learned = max_learned
+        self.gates = dict() if gates is None else gates
+        self.roots = []  # original clauses that do not define a gate, cubes only have to satisfy these
+        self.num_conflicts = 0
+        self.num_solutions = 0
+        self.num_deleted = 0
+        for clause in clauses:
+            clause = set(clause)
+            if not any(-lit in clause for lit in clause):
+                if not self._defines(clause):
+                    self.roots.append(len(self.constraints))
+                self._add(self._reduce(clause, CLAUSE), CLAUSE)
+        self.num_original = len(self.constraints)
+        first = dict()  # a block is decided in the order of the clauses, which keeps related vars together
+        for index, clause in enumerate(self.constraints):
+            for lit in clause:
+                first.setdefault(abs(lit), index)
+        self.order.sort(key=lambda var: (self.qlevels[var], first.get(var, len(self.constraints))))
+        self.indices = [0] * (num_vars + 1)
+        for index, var in enumerate(self.order):
+            self.indices[var] = index
+
+    def _defines(self, clause):
+        for lit in clause:
+            if abs(lit) in self.gates:
+                _, inputs = self.gates[abs(lit)]
+                if (len(clause) > 1 or not inputs) and clause - {lit} <= set(inputs) | {-x for x in inputs}:
+                    return True
+        return False
+
+    def _value(self, lit):
+        value = self.values[abs(lit)]
+        return value if value is None or lit > 0 else not value
+
+    def _owned(self, lit, kind):
+        return self.universal[abs(lit)] == (kind == CUBE)
+
+    def _reduce(self, lits, kind):  # universal reduction for clauses, existential reduction for cubes
+        top = max((self.qlevels[abs(lit)] for lit in lits if self._owned(lit, kind)), default=-1)
+        return {lit for lit in lits if self._owned(lit, kind) or self.qlevels[abs(lit)] < top}
+
+    def _add(self, lits, kind):
+        self.constraints.append(list(lits))
+        self.kinds.append(kind)
+        self.watched.append(())
+        return len(self.constraints) - 1
+
+    def _watch(self, index, first, second):
+        for lit in {first, second}:
+            if lit not in self.watched[index]:
+                self.watches[lit].append(index)
+        self.watched[index] = first, second
+
+    def _examine(self, index):
+        kind = self.kinds[index]
+        true_lit, owned, other, false_lits = None, [], [], []
+        for lit in self.constraints[index]:
+            value = self._value(lit)
+            if value is None:
+                (owned if self._owned(lit, kind) else other).append(lit)
+            elif value:
+                true_lit = lit
+            else:
+                false_lits.append(lit)
+        false_lits.sort(key=lambda lit: self.positions[abs(lit)], reverse=True)
+        if true_lit is not None:
+            self._watch(index, true_lit, (owned + other + false_lits + [true_lit])[0])
+            return SATISFIED, None
+        top = max((self.qlevels[abs(lit)] for lit in owned), default=-1)
+        blocking = [lit for lit in other if self.qlevels[abs(lit)] < top]
+        if not owned:
+            lits = false_lits + other
+            if lits:
+                self._watch(index, lits[0], (lits[1:] + lits)[0])
+            return CONFLICT, None
+        if len(owned) == 1 and not blocking:
+            self._watch(index, owned[0], (false_lits + other + owned)[0])
+            return UNIT, owned[0]
+        self._watch(index, owned[0], owned[1] if len(owned) > 1 else blocking[0])
+        return OPEN, None
+
+    def _assign(self, lit, reason):
+        var = abs(lit)
+        self.values[var] = lit > 0
+        self.levels[var] = len(self.trail_limits)
+        self.reasons[var] = reason
+        self.positions[var] = len(self.trail)
+        self.trail.append(lit)
+
+    def _backtrack(self, level):
+        while len(self.trail_limits) > level:
+            limit = self.trail_limits.pop()
+            for lit in self.trail[limit:]:
+                var = abs(lit)
+                self.phases[var] = lit > 0
+                self.values[var] = None
+                self.reasons[var] = None
+                self.next_index = min(self.next_index, self.indices[var])
+            del self.trail[limit:]
+        self.head = len(self.trail)
+
+    def _propagate(self):
+        while self.head < len(self.trail):
+            false_lit = -self.trail[self.head]
+            self.head += 1
+            pending, self.watches[false_lit] = self.watches[false_lit], []
+            for i, index in enumerate(pending):
+                if false_lit not in self.watched[index]:
+                    continue
+                first, second = self.watched[index]
+                if self._value(second if first == false_lit else first):  # satisfied by the other watch
+                    self.watches[false_lit].append(index)
+                    continue
+                status, unit = self._examine(index)
+                if false_lit in self.watched[index]:
+                    self.watches[false_lit].append(index)
+                if status == CONFLICT:
+                    self.watches[false_lit].extend(pending[i + 1:])
+                    return index
+                if status == UNIT:
+                    self._assign(unit, index)
+        return None
+
+    def _decide(self):  # in prefix order, so that every decision respects the quantifier levels
+        while self.next_index < len(self.order) and self.values[self.order[self.next_index]] is not None:
+            self.next_index += 1
+        if self.next_index == len(self.order):
+            return False
+        var = self.order[self.next_index]
+        self.trail_limits.append(len(self.trail))
+        self._assign(var if self.phases[var] else -var, None)
+        return True
+
+    def _assign_pure_literals(self):
+        occurrences = defaultdict(set)
+        for clause in self.constraints:
+            for lit in clause:
+                occurrences[abs(lit)].add(lit > 0)
+        for var, signs in occurrences.items():
+            if len(signs) == 1 and self.values[var] is None:
+                positive = signs.pop() != self.universal[var]
+                self._assign(var if positive else -var, None)
+
+    def _justify(self, lit, justified, cube):  # true literals that fix lit through the gates, gates are innermost
+        stack = [lit]
+        while stack:
+            lit = stack.pop()
+            if lit in justified:
+                continue
+            justified.add(lit)
+            if abs(lit) not in self.gates:
+                cube.add(lit)
+                continue
+            op_type, inputs = self.gates[abs(lit)]
+            if op_type == OperationType.AND and lit < 0:  # one false input is enough, the earliest one
+                stack.append(min([-x for x in inputs if not self._value(x)],
+                                 key=lambda x: (x not in justified, self.positions[abs(x)])))
+            else:
+                stack.extend(x if self._value(x) else -x for x in inputs)
+
+    def _model_cube(self):  # true literals that satisfy the clauses, stored negated
+        justified, cube = set(), set()
+        for index in self.roots:
+            clause = self.constraints[index]
+            if not any(lit in justified for lit in clause):
+                lit = min([lit for lit in clause if self._value(lit)],
+                          key=lambda lit: (self.universal[abs(lit)], -self.qlevels[abs(lit)]))
+                self._justify(lit, justified, cube)
+        index = self._add(self._reduce({-lit for lit in cube}, CUBE), CUBE)
+        self.learned.append((len({self.levels[abs(lit)] for lit in self.constraints[index]}), index))
+        self._examine(index)
+        return index
+
+    def _falsified_clause(self):
+        for index in range(self.num_original):
+            if not any(self._value(lit) for lit in self.constraints[index]):
+                return index
+        return None
+
+    def _asserting_level(self, learned, kind):  # backtrack level at which learned becomes unit, if any
+        level = len(self.trail_limits)
+        current = [lit for lit in learned if self._owned(lit, kind) and self.values[abs(lit)] is not None and
+                   self.levels[abs(lit)] == level]
+        if len(current) != 1:
+            return None
+        unit, backtrack = current[0], 0
+        for lit in learned:
+            var = abs(lit)
+            if lit == unit:
+                continue
+            if self.values[var] is not None and self.levels[var] < level:
+                backtrack = max(backtrack, self.levels[var])
+            elif self._owned(lit, kind) or self.qlevels[var] < self.qlevels[abs(unit)]:
+                return None
+        return backtrack
+
+    def _relevant_decisions(self, lits, kind):  # negated decisions the constraint depends on
+        seen, decisions = set(), []
+        stack = [abs(lit) for lit in lits if self.values[abs(lit)] is not None]
+        while stack:
+            var = stack.pop()
+            if var in seen or not self.levels[var]:
+                continue
+            seen.add(var)
+            if self.reasons[var] is None:
+                decisions.append(-var if self.values[var] else var)
+            else:
+                stack.extend(abs(lit) for lit in self.constraints[self.reasons[var]]
+                             if abs(lit) != var and self.values[abs(lit)] is not None)
+        return self._reduce(decisions, kind)
+
+    def _analyze(self, index):  # Q-resolution up to an asserting constraint, else decision learning
+        kind, lits = self.kinds[index], self.constraints[index]
+        learned = self._reduce({lit for lit in lits if self.values[abs(lit)] is None or self.levels[abs(lit)]}, kind)
+        while learned:
+            backtrack = self._asserting_level(learned, kind)
+            if backtrack is not None:
+                return learned, backtrack
+            level = len(self.trail_limits)
+            pivots = [lit for lit in learned if self._owned(lit, kind) and self.values[abs(lit)] is not None and
+                      self.levels[abs(lit)] == level and self.reasons[abs(lit)] is not None]
+            if not pivots:
+                break
+            pivot = max(pivots, key=lambda lit: self.positions[abs(lit)])
+            resolvent = learned - {pivot}
+            resolvent.update(lit for lit in self.constraints[self.reasons[abs(pivot)]] if lit != -pivot and
+                             (self.values[abs(lit)] is None or self.levels[abs(lit)]))
+            if any(-lit in resolvent for lit in resolvent):
+                break
+            learned = self._reduce(resolvent, kind)
+        if not learned:
+            return learned, 0
+        learned = self._relevant_decisions(lits, kind)
+        backtrack = self._asserting_level(learned, kind)
+        return learned, len(self.trail_limits) - 1 if backtrack is None else backtrack
+
+    def _delete(self):  # deletes the less useful half of the learned constraints, keeping reasons
+        locked = {self.reasons[abs(lit)] for lit in self.trail}
+        self.learned.sort()
+        for lbd, index in self.learned[len(self.learned) // 2:]:
+            if lbd > 2 and index not in locked:
+                self.constraints[index] = None
+                self.watched[index] = ()
+                self.num_deleted += 1
+        self.learned = [(lbd, index) for lbd, index in self.learned if self.constraints[index] is not None]
+        self.max_learned = int(self.max_learned * 1.1)
+
+    def solve(self):
+        for index in range(len(self.constraints)):
+            status, unit = self._examine(index)
+            if status == CONFLICT:
+                return False
+            if status == UNIT and self._value(unit) is None:
+                self._assign(unit, index)
+        self._assign_pure_literals()
+        while True:
+            if len(self.learned) > self.max_learned:
+                self._delete()
+            index = self._propagate()
+            if index is None:
+                if self._decide():
+                    continue
+                index = self._falsified_clause()
+                if index is None:
+                    index = self._model_cube()
+            while index is not None:
+                kind = self.kinds[index]
+                lits = [lit for lit in self.constraints[index] if self.values[abs(lit)] is not None]
+                self._backtrack(max((self.levels[abs(lit)] for lit in lits), default=0))  # analyzed where it failed
+                if kind == CLAUSE:
+                    self.num_conflicts += 1
+                else:
+                    self.num_solutions += 1
+                if not self.trail_limits:
+                    return kind == CUBE
+                learned, level = self._analyze(index)
+                if not learned:
+                    return kind == CUBE
+                lbd = len({self.levels[abs(lit)] for lit in learned if self.values[abs(lit)] is not None})
+                self._backtrack(level)
+                index = self._add(learned, kind)
+                self.learned.append((lbd, index))
+                status, unit = self._examine(index)
+                if status == UNIT:
+                    self._assign(unit, index)
+                if status != CONFLICT:
+                    index = None
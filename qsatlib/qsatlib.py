@@ -1,5 +1,8 @@
+import copy
+import threading
 from enum import Enum
 from typing import Sequence
+from weakref import WeakValueDictionary
 
 
 class QuantifierType(Enum):
@@ -16,7 +19,92 @@ class OperationType(Enum):
     EQ = '='
 
 
+unique_table = WeakValueDictionary()
+unique_table_lock = threading.Lock()
+
+
+def _intern(cls, key, **fields):
+    with unique_table_lock:
+        node = unique_table.get(key)
+        if node is None:
+            node = object.__new__(cls)
+            for name, value in fields.items():
+                setattr(node, name, value)
+            constructs = getattr(FormulaContext._local, 'constructs', None)
+            if constructs:
+                node._provenance = constructs[-1]
+            unique_table[key] = node
+        return node
+
+
+class FormulaContext:  # hands out dense bit ids, use "with FormulaContext():" to scope them
+    _local = threading.local()
+
+    def __init__(self, reuse_operations=False):
+        self.lock = threading.Lock()
+        self.num_bits = 0
+        self.operations = dict() if reuse_operations else None  # (method, operand ids) -> (result, operands)
+
+    def new_id(self):
+        with self.lock:
+            self.num_bits += 1
+            return self.num_bits - 1
+
+    def reset(self):
+        with self.lock:
+            self.num_bits = 0
+            if self.operations is not None:
+                self.operations.clear()
+
+    def __enter__(self):
+        FormulaContext._stack().append(self)
+        return self
+
+    def __exit__(self, *exc_info):
+        FormulaContext._stack().pop()
+
+    @staticmethod
+    def _stack():
+        if not hasattr(FormulaContext._local, 'stack'):
+            FormulaContext._local.stack = []
+        return FormulaContext._local.stack
+
+    @staticmethod
+    def _constructs():  # names of the operations and relations being built, innermost last
+        if not hasattr(FormulaContext._local, 'constructs'):
+            FormulaContext._local.constructs = []
+        return FormulaContext._local.constructs
+
+
+default_context = FormulaContext()
+
+
+def current_context():
+    stack = FormulaContext._stack()
+    return stack[-1] if stack else default_context
+
+
+def fresh_context(formula):  # new bits from this context do not clash with the bits of the formula
+    context = FormulaContext()
+    for node in postorder(formula):
+        if isinstance(node, BitNode):
+            context.num_bits = max(context.num_bits, node.id + 1)
+        elif isinstance(node, QuantifierNode):
+            context.num_bits = max([context.num_bits] + [variable.id + 1 for variable in node.variables])
+    return context
+
+
+_CACHES = '_kernel', '_vector_kernel', '_ternary_kernel', '_support', '_simplified', '_table'
+
+
 class Formula:
+    __slots__ = ('__weakref__', '_provenance') + _CACHES
+
+    def __getstate__(self):  # the caches hold compiled functions and are rebuilt on demand, so they are not pickled
+        slots = [name for cls in type(self).__mro__ for name in getattr(cls, '__slots__', ())]
+        return None, {name: getattr(self, name) for name in slots
+                      if name != '__weakref__' and name not in _CACHES and hasattr(self, name)}
+
     def __invert__(self):
         return OperationNode(OperationType.NOT, self)
 
@@ -36,52 +124,198 @@ class Formula:
         return ~(self == other)
 
 
-counter = 0
-
-
 class BitNode(Formula):
+    __slots__ = 'id',
+
     def __init__(self):
-        super().__init__()
-        global counter
-        counter += 1
-        self.id = counter
+        self.id = current_context().new_id()
 
     def __str__(self):
         return f'x{self.id}'
 
 
 class ConstantNode(Formula):
-    def __init__(self, value: bool):
-        super().__init__()
-        self.value = value
+    __slots__ = 'value',
+
+    def __new__(cls, value: bool):
+        return _intern(cls, (cls, bool(value)), value=bool(value))
+
+    def __getnewargs__(self):
+        return self.value,
 
     def __str__(self):
         return str(int(self.value))
 
 
 class QuantifierNode(Formula):
-    def __init__(self, quantifier: QuantifierType, variables: Sequence[BitNode], child: Formula):
-        super().__init__()
-        self.quantifier = quantifier
-        self.variables = variables
-        self.child = child
+    __slots__ = 'quantifier', 'variables', 'child'
+
+    def __new__(cls, quantifier: QuantifierType, variables: Sequence[BitNode], child: Formula):
+        variables = tuple(variables)
+        return _intern(cls, (cls, quantifier, tuple(map(id, variables)), id(child)),
+                       quantifier=quantifier, variables=variables, child=child)
+
+    def __getnewargs__(self):
+        return self.quantifier, self.variables, self.child
 
     def __str__(self):
-        return f'{self.quantifier.value}{",".join(map(str, self.variables))} {self.child}'
+        return _to_string(self)
 
 
 class OperationNode(Formula):
-    def __init__(self, op_type: OperationType, *children: Formula):
-        super().__init__()
-        self.op_type = op_type
-        self.children = children
+    __slots__ = 'op_type', 'children'
+
+    def __new__(cls, op_type: OperationType, *children: Formula):
+        return _intern(cls, (cls, op_type, tuple(map(id, children))), op_type=op_type, children=children)
+
+    def __getnewargs__(self):
+        return (self.op_type, *self.children)
 
     def __str__(self):
-        if self.op_type == OperationType.NOT:
-            return f'{self.op_type.value}{self.children[0]}'
-        if len(self.children) == 1:
-            return str(self.children[0])
-        return '(' + f' {self.op_type.value} '.join(map(str, self.children)) + ')'
+        return _to_string(self)
+
+
+def _to_string(formula: Formula):  # tokens are joined once, so the time is linear in the length of the result
+    tokens = []
+    stack = [formula]  # nodes still to print and literal tokens, in reverse order
+    while stack:
+        item = stack.pop()
+        if isinstance(item, str):
+            tokens.append(item)
+        elif isinstance(item, QuantifierNode):
+            tokens.append(f'{item.quantifier.value}{",".join(map(str, item.variables))} ')
+            stack.append(item.child)
+        elif isinstance(item, OperationNode) and item.op_type == OperationType.NOT:
+            tokens.append(item.op_type.value)
+            stack.append(item.children[0])
+        elif isinstance(item, OperationNode) and len(item.children) != 1:
+            stack.append(')')
+            for i, child in enumerate(reversed(item.children)):
+                stack.append(child)
+                if i < len(item.children) - 1:
+                    stack.append(f' {item.op_type.value} ')
+            tokens.append('(')
+        elif isinstance(item, OperationNode):
+            stack.append(item.children[0])
+        else:
+            tokens.append(str(item))
+    return ''.join(tokens)
+
+
+def provenance(formula: Formula):  # the operation or relation that created the node, such as 'UIntBinary.__mul__'
+    return getattr(formula, '_provenance', None)
+
+
+def inherit_provenance(copy: Formula, original: Formula):  # for rewritten nodes built outside of any construct
+    if provenance(copy) is None and provenance(original) is not None:
+        copy._provenance = original._provenance
+    return copy
+
+
+def children_of(formula: Formula):
+    if isinstance(formula, OperationNode):
+        return formula.children
+    if isinstance(formula, QuantifierNode):
+        return formula.child,
+    return ()
+
+
+def postorder(formula: Formula, expand=children_of):
+    visited = set()
+    stack = [(formula, False)]
+    while stack:
+        node, expanded = stack.pop()
+        if expanded:
+            yield node
+            continue
+        if id(node) in visited:
+            continue
+        visited.add(id(node))
+        stack.append((node, True))
+        for child in reversed(expand(node)):
+            stack.append((child, False))
+
+
+def _unknown_support(node):
+    return () if getattr(node, '_support', None) is not None else children_of(node)
+
+
+def free_variables(formula: Formula):  # ids of free bits, cached on every node
+    for node in postorder(formula, _unknown_support):
+        if getattr(node, '_support', None) is not None:
+            continue
+        if isinstance(node, BitNode):
+            support = frozenset([node.id])
+        elif isinstance(node, QuantifierNode):
+            support = node.child._support
+            if any(variable.id in support for variable in node.variables):
+                support = support - {variable.id for variable in node.variables}
+        else:
+            supports = sorted([child._support for child in children_of(node)], key=len)
+            support = supports[-1] if supports else frozenset()
+            if not all(other <= support for other in supports):  # otherwise share the largest set
+                support = support.union(*supports)
+        node._support = support
+    return formula._support
+
+
+def substitute(formula: Formula, mapping, rename=True):  # with rename, bound variables get fresh bits
+    mapping = dict(mapping)
+    for node in postorder(formula) if rename else ():
+        if isinstance(node, QuantifierNode):
+            for variable in node.variables:
+                mapping[variable.id] = BitNode()
+    copies = dict()
+    for node in postorder(formula):
+        if isinstance(node, BitNode):
+            copy = mapping.get(node.id, node)
+        elif isinstance(node, QuantifierNode):
+            variables = [mapping[variable.id] for variable in node.variables] if rename else node.variables
+            copy = QuantifierNode(node.quantifier, variables, copies[id(node.child)])
+        elif isinstance(node, OperationNode):
+            copy = OperationNode(node.op_type, *[copies[id(child)] for child in node.children])
+        else:
+            copy = node
+        copies[id(node)] = copy
+    return copies[id(formula)]
+
+
+def serialize(formula: Formula):  # flat node list in postorder, cheap to pickle at any depth
+    indices, nodes = dict(), []
+    for node in postorder(formula):
+        if isinstance(node, BitNode):
+            nodes.append(('bit', node.id))
+        elif isinstance(node, ConstantNode):
+            nodes.append(('constant', node.value))
+        elif isinstance(node, QuantifierNode):
+            nodes.append(('quantifier', node.quantifier.name, tuple(variable.id for variable in node.variables),
+                          indices[id(node.child)]))
+        else:
+            nodes.append(('operation', node.op_type.name, *[indices[id(child)] for child in node.children]))
+        indices[id(node)] = len(indices)
+    return nodes
+
+
+def deserialize(nodes):
+    bits, formulas = dict(), []
+
+    def bit(bit_id):
+        if bit_id not in bits:
+            bits[bit_id] = BitNode.__new__(BitNode)
+            bits[bit_id].id = bit_id
+        return bits[bit_id]
+
+    for kind, *fields in nodes:
+        if kind == 'bit':
+            formulas.append(bit(fields[0]))
+        elif kind == 'constant':
+            formulas.append(ConstantNode(fields[0]))
+        elif kind == 'quantifier':
+            formulas.append(QuantifierNode(QuantifierType[fields[0]], [bit(bit_id) for bit_id in fields[1]],
+                                           formulas[fields[2]]))
+        else:
+            formulas.append(OperationNode(OperationType[fields[0]], *[formulas[index] for index in fields[1:]]))
+    return formulas[-1]
 
 
 def implies(left: Formula, right: Formula):
@@ -132,33 +366,69 @@ def is_auxiliary(variable):
     return isinstance(variable, Variable) and variable.auxiliary
 
 
-def operation(func):
+def _copy(variable):  # the same variable with fresh bits
+    result = copy.copy(variable)
+    result.bits = [BitNode() for _ in variable.bits]
+    result.constraint = substitute(variable.constraint, {bit.id: other for bit, other in zip(variable.bits,
+                                                                                              result.bits)})
+    result.consumed = False
+    return result
+
+
+def _consume(variables):  # auxiliary operands are bound by their consumer, one consumed before is copied first
+    operands, aux_vars = [], []
+    for variable in variables:
+        if is_auxiliary(variable):
+            match = [other for original, other in aux_vars if original is variable]
+            if match:
+                operands.append(match[0])
+                continue
+            original = variable
+            if variable.consumed:
+                variable = _copy(variable)
+            original.consumed = True
+            aux_vars.append((original, variable))
+        operands.append(variable)
+    return operands, [variable for _, variable in aux_vars]
+
+
+def operation(func):  # with reuse_operations, a result is shared until it is consumed by another construct
     def inner(*variables):
-        aux_vars = []
-        for variable in variables:
-            if is_auxiliary(variable):
-                variable.auxiliary = False
-                aux_vars.append(variable)
-        result = func(*variables)
-        result.auxiliary = True
-        if aux_vars:
-            result.constraint = exist(*aux_vars, result.constraint)
-        return result
+        memo = current_context().operations
+        if memo is not None:
+            key = func, tuple(map(id, variables))
+            entry = memo.get(key)
+            if entry is not None and not entry[0].consumed:
+                return entry[0]
+        constructs = FormulaContext._constructs()
+        constructs.append(func.__qualname__)
+        try:
+            operands, aux_vars = _consume(variables)
+            result = func(*operands)
+            result.auxiliary = True
+            if aux_vars:
+                result.constraint = exist(*aux_vars, result.constraint)
+            if memo is not None:
+                memo[key] = result, variables  # the operands stay alive, so that their ids are not reused
+            return result
+        finally:
+            constructs.pop()
 
     return inner
 
 
 def relation(func):
     def inner(*variables):
-        aux_vars = []
-        for variable in variables:
-            if is_auxiliary(variable):
-                variable.auxiliary = False
-                aux_vars.append(variable)
-        formula = func(*variables)
-        if aux_vars:
-            formula = exist(*aux_vars, formula)
-        return formula
+        constructs = FormulaContext._constructs()
+        constructs.append(func.__qualname__)
+        try:
+            operands, aux_vars = _consume(variables)
+            formula = func(*operands)
+            if aux_vars:
+                formula = exist(*aux_vars, formula)
+            return formula
+        finally:
+            constructs.pop()
 
     return inner
 
@@ -168,6 +438,7 @@ class Variable:
         self.bits = [BitNode() for _ in range(num_bits)]
         self.constraint = ConstantNode(True)
         self.auxiliary = False
+        self.consumed = False  # an auxiliary variable that a consumer has bound, later consumers get a copy
 
     def __len__(self):
         return len(self.bits)
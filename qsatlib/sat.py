@@ -0,0 +1,232 @@
+import heapq
+from collections import defaultdict
+
+
+def luby(i):  # 1, 1, 2, 1, 1, 2, 4, 1, ...
+    size, power = 1, 0
+    while size < i + 1:
+        size, power = 2 * size + 1, power + 1
+    while size - 1 != i:
+        size //= 2
+        power -= 1
+        i %= size
+    return 2 ** power
+
+
+class SatSolver:  # CDCL with two watched literals, incremental: clauses can be added between calls to solve
+    def __init__(self, restart_interval=100, decay=0.95, max_learned=2000):
+        self.restart_interval = restart_interval
+        self.decay = decay
+        self.max_learned = max_learned
+        self.num_vars = 0
+        self.values = [None]
+        self.levels = [0]
+        self.reasons = [None]
+        self.phases = [False]
+        self.activity = [0.0]
+        self.increment = 1.0
+        self.heap = []  # (-activity, var), stale entries are skipped when popped
+        self.clauses = []  # deleted learned clauses become None
+        self.learned = []  # (lbd, index) of learned clauses
+        self.watches = defaultdict(list)  # literal -> clauses that watch it in one of their first two positions
+        self.trail = []
+        self.trail_limits = []
+        self.head = 0
+        self.unsatisfiable = False
+        self.model = None
+        self.num_conflicts = 0
+        self.num_decisions = 0
+        self.num_restarts = 0
+        self.num_deleted = 0
+
+    def new_var(self):
+        self._reserve(self.num_vars + 1)
+        return self.num_vars
+
+    def _reserve(self, num_vars):
+        while self.num_vars < num_vars:
+            self.values.append(None)
+            self.levels.append(0)
+            self.reasons.append(None)
+            self.phases.append(False)
+            self.activity.append(0.0)
+            self.num_vars += 1
+            heapq.heappush(self.heap, (0.0, self.num_vars))
+
+    def _value(self, lit):
+        value = self.values[abs(lit)]
+        return value if value is None or lit > 0 else not value
+
+    def add_clause(self, lits):  # returns False once the clauses are unsatisfiable
+        self._backtrack(0)
+        lits = set(lits)
+        self._reserve(max(map(abs, lits), default=0))
+        if self.unsatisfiable or any(-lit in lits or self._value(lit) for lit in lits):
+            return not self.unsatisfiable
+        lits = [lit for lit in lits if self._value(lit) is None]
+        if not lits:
+            self.unsatisfiable = True
+        elif len(lits) == 1:
+            self._assign(lits[0], None)
+            self.unsatisfiable = self._propagate() is not None
+        else:
+            self._attach(lits)
+        return not self.unsatisfiable
+
+    def _attach(self, lits):
+        self.clauses.append(lits)
+        self.watches[lits[0]].append(len(self.clauses) - 1)
+        self.watches[lits[1]].append(len(self.clauses) - 1)
+        return len(self.clauses) - 1
+
+    def _assign(self, lit, reason):
+        var = abs(lit)
+        self.values[var] = lit > 0
+        self.levels[var] = len(self.trail_limits)
+        self.reasons[var] = reason
+        self.trail.append(lit)
+
+    def _backtrack(self, level):
+        while len(self.trail_limits) > level:
+            limit = self.trail_limits.pop()
+            for lit in self.trail[limit:]:
+                var = abs(lit)
+                self.phases[var] = lit > 0
+                self.values[var] = None
+                self.reasons[var] = None
+                heapq.heappush(self.heap, (-self.activity[var], var))
+            del self.trail[limit:]
+        self.head = len(self.trail)
+
+    def _propagate(self):  # returns a conflicting clause index or None
+        while self.head < len(self.trail):
+            false_lit = -self.trail[self.head]
+            self.head += 1
+            pending, self.watches[false_lit] = self.watches[false_lit], []
+            for i, index in enumerate(pending):
+                clause = self.clauses[index]
+                if clause is None:
+                    continue
+                if clause[0] == false_lit:
+                    clause[0], clause[1] = clause[1], clause[0]
+                if self._value(clause[0]):
+                    self.watches[false_lit].append(index)
+                    continue
+                for k in range(2, len(clause)):
+                    if self._value(clause[k]) is not False:
+                        clause[1], clause[k] = clause[k], clause[1]
+                        self.watches[clause[1]].append(index)
+                        break
+                else:
+                    self.watches[false_lit].append(index)
+                    if self._value(clause[0]) is False:
+                        self.watches[false_lit].extend(pending[i + 1:])
+                        return index
+                    self._assign(clause[0], index)
+        return None
+
+    def _bump(self, var):
+        self.activity[var] += self.increment
+        if self.activity[var] > 1e100:
+            self.activity = [activity * 1e-100 for activity in self.activity]
+            self.increment *= 1e-100
+            self.heap = [(-self.activity[other], other) for other in range(1, self.num_vars + 1)
+                         if self.values[other] is None]
+            heapq.heapify(self.heap)
+        elif self.values[var] is None:
+            heapq.heappush(self.heap, (-self.activity[var], var))
+
+    def _analyze(self, conflict):  # first unique implication point, the asserting literal goes first
+        level = len(self.trail_limits)
+        learned, seen, pending = [None], set(), 0
+        lit, position, clause = None, len(self.trail) - 1, self.clauses[conflict]
+        while True:
+            for other in clause:
+                var = abs(other)
+                if other != lit and var not in seen and self.levels[var] > 0:
+                    seen.add(var)
+                    self._bump(var)
+                    if self.levels[var] == level:
+                        pending += 1
+                    else:
+                        learned.append(other)
+            while abs(self.trail[position]) not in seen:
+                position -= 1
+            lit = self.trail[position]
+            position -= 1
+            pending -= 1
+            if not pending:
+                break
+            clause = self.clauses[self.reasons[abs(lit)]]
+        learned[0] = -lit
+        self.increment /= self.decay
+        if len(learned) == 1:
+            return learned, 0
+        second = max(range(1, len(learned)), key=lambda i: self.levels[abs(learned[i])])
+        learned[1], learned[second] = learned[second], learned[1]
+        return learned, self.levels[abs(learned[1])]
+
+    def _reduce(self):  # deletes the less useful half of the learned clauses, keeping reasons and glue clauses
+        locked = {self.reasons[abs(lit)] for lit in self.trail}
+        self.learned.sort()
+        for lbd, index in self.learned[len(self.learned) // 2:]:
+            if lbd > 2 and index not in locked:
+                self.clauses[index] = None
+                self.num_deleted += 1
+        self.learned = [(lbd, index) for lbd, index in self.learned if self.clauses[index] is not None]
+        self.max_learned = int(self.max_learned * 1.1)
+
+    def _decide(self):  # the unassigned var with the highest activity
+        while self.heap:
+            _, var = heapq.heappop(self.heap)
+            if self.values[var] is None:
+                self.num_decisions += 1
+                self.trail_limits.append(len(self.trail))
+                self._assign(var if self.phases[var] else -var, None)
+                return True
+        return False
+
+    def solve(self, assumptions=(), max_conflicts=None):  # on success, model[var] is the value of every var
+        self.model = None  # None is returned once max_conflicts is reached
+        if self.unsatisfiable:
+            return False
+        self._backtrack(0)
+        self._reserve(max(map(abs, assumptions), default=0))
+        restarts, conflicts, budget = 0, 0, max_conflicts
+        while True:
+            conflict = self._propagate()
+            if conflict is not None:
+                self.num_conflicts += 1
+                conflicts += 1
+                if not self.trail_limits:
+                    self.unsatisfiable = True
+                    return False
+                if budget is not None:
+                    if not budget:
+                        return None
+                    budget -= 1
+                learned, level = self._analyze(conflict)
+                self._backtrack(level)
+                if len(learned) == 1:
+                    self._assign(learned[0], None)
+                else:
+                    index = self._attach(learned)
+                    self.learned.append((len({self.levels[abs(lit)] for lit in learned}), index))
+                    self._assign(learned[0], index)
+            elif conflicts >= self.restart_interval * luby(restarts):
+                self.num_restarts += 1
+                restarts, conflicts = restarts + 1, 0
+                self._backtrack(0)
+                if len(self.learned) > self.max_learned:
+                    self._reduce()
+            elif len(self.trail_limits) < len(assumptions):  # every assumption gets its own decision level
+                lit = assumptions[len(self.trail_limits)]
+                value = self._value(lit)
+                if value is False:
+                    return False
+                self.trail_limits.append(len(self.trail))
+                if value is None:
+                    self._assign(lit, None)
+            elif not self._decide():
+                self.model = list(self.values)
+                return True
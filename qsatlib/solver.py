@@ -1,87 +1,611 @@
+import heapq
+import multiprocessing
+import os
+import subprocess
+import tempfile
+from collections import OrderedDict, defaultdict
+from concurrent.futures import ProcessPoolExecutor, as_completed, wait
+from operator import itemgetter
+
 from qsatlib.qsatlib import *
+from qsatlib.bdd import Bdd, FALSE, to_bdd
+from qsatlib.compiler import compile_formula, compile_ternary, tabulate, truth_table_patterns
+from qsatlib.preprocess import preprocess, simplify
+from qsatlib.qdimacs import QdimacsEncoding, Tseitin, prenex, to_qdimacs
+from qsatlib.qdpll import Qdpll
+from qsatlib.sat import SatSolver
+from qsatlib.stats import SolverStats
 from qsatlib.error import *
 
+CAQE_PATH = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'caqe', 'target', 'release', 'caqe')
+
+
+UNASSIGNED = 2
+
+
+_IDENTITIES = {OperationType.AND: True, OperationType.OR: False, OperationType.XOR: False}
+
+
+def _decided(quantifier, cnt_ok, cnt_fail):
+    return (quantifier == QuantifierType.EXISTS and cnt_ok > 0 or
+            quantifier == QuantifierType.FORALL and cnt_fail > 0 or
+            quantifier == QuantifierType.EXISTS_UNIQUE and cnt_ok >= 2)
+
+
+def _result(quantifier, cnt_ok, cnt_fail):
+    if quantifier == QuantifierType.EXISTS:
+        return cnt_ok > 0
+    if quantifier == QuantifierType.FORALL:
+        return cnt_fail == 0
+    if quantifier == QuantifierType.EXISTS_UNIQUE:
+        return cnt_ok == 1
+    raise SuckError(f'Unknown quantifier type {quantifier}')
+
+
+class _GrayCodeEvaluator:  # caches the values of the quantified skeleton, a flipped bit re-evaluates its fan-out
+    def __init__(self, formula):
+        quantified = set()
+        for node in postorder(formula):
+            if isinstance(node, QuantifierNode) or any(id(child) in quantified for child in children_of(node)):
+                quantified.add(id(node))
+
+        def expand(node):  # quantifier-free subformulas and quantifiers are leaves, evaluated as a whole
+            return node.children if isinstance(node, OperationNode) and id(node) in quantified else ()
+
+        self.nodes = list(postorder(formula, expand))
+        indices = {id(node): i for i, node in enumerate(self.nodes)}
+        self.children = [[indices[id(child)] for child in expand(node)] for node in self.nodes]
+        self.parents = [[] for _ in self.nodes]
+        self.watchers = defaultdict(list)  # bit id -> leaves that depend on it
+        for i, node in enumerate(self.nodes):
+            for child in self.children[i]:
+                self.parents[child].append(i)
+            if not self.children[i]:
+                for bit_id in free_variables(node):
+                    self.watchers[bit_id].append(i)
+        self.kernels = [None if self.children[i] else compile_formula(node) for i, node in enumerate(self.nodes)]
+        self.values = [False] * len(self.nodes)
+
+    def _combine(self, i):  # the value of an inner node from the values of its children
+        node = self.nodes[i]
+        values = [self.values[child] for child in self.children[i]]
+        if node.op_type == OperationType.NOT:
+            return not values[0]
+        if node.op_type == OperationType.AND:
+            return all(values)
+        if node.op_type == OperationType.OR:
+            return any(values)
+        if node.op_type == OperationType.XOR:
+            return sum(values) % 2 == 1
+        if node.op_type == OperationType.EQ:
+            return values[0] == values[1]
+        raise SuckError(f'Unknown operation type {node.op_type}')
+
+    def _leaf(self, i, assignments):  # quantified leaves are yielded to the solver, see BruteForceSolver._run
+        kernel = self.kernels[i]
+        return bool(kernel(assignments) if kernel is not None else (yield self.nodes[i]))
+
+    def reset(self, assignments):
+        for i in range(len(self.nodes)):
+            self.values[i] = self._combine(i) if self.children[i] else (yield from self._leaf(i, assignments))
+        return self.values[-1]
+
+    def flip(self, bit_id, assignments):  # nodes are re-evaluated in postorder, each at most once
+        pending = list(self.watchers[bit_id])
+        queued = set(pending)
+        heapq.heapify(pending)
+        while pending:
+            i = heapq.heappop(pending)
+            value = self._combine(i) if self.children[i] else (yield from self._leaf(i, assignments))
+            if value != self.values[i]:
+                self.values[i] = value
+                for parent in self.parents[i]:
+                    if parent not in queued:
+                        queued.add(parent)
+                        heapq.heappush(pending, parent)
+        return self.values[-1]
+
 
 class BruteForceSolver:
+    def __init__(self, parallel_bits=16, partial_evaluation=True, memo_size=2 ** 16, preprocessing=True, sat=True,
+                 max_table_support=16, max_table_memory=2 ** 22, gray_code=False, callbacks=()):
+        self.preprocessing = preprocessing
+        self.gray_code = gray_code  # blocks without a vector kernel are enumerated one flipped bit at a time
+        self.sat = sat
+        self.max_table_support = max_table_support  # 0 disables truth tables
+        self.max_table_memory = max_table_memory
+        self.model = None  # {bit id: value} when the formula was solved as SAT
+        self.parallel_bits = parallel_bits
+        self.partial_evaluation = partial_evaluation
+        self.memo_size = memo_size
+        self.memo = OrderedDict()  # (id(quantifier), values of its free bits) -> result, least recently used first
+        self.projections = dict()
+        self.evaluators = dict()
+        self.vectors = []
+        self.callbacks = list(callbacks)  # callback(quantifier, result, seconds), see SolverStats
+        self.stats = SolverStats(self.callbacks)
+
     def solve(self, formula: Formula, assignments=None):
+        self.stats = SolverStats(self.callbacks)
+        result = self._solve_sat(formula, assignments)
+        if result is not None:
+            return result
+        if self.preprocessing:
+            formula = preprocess(formula)
+        if self.max_table_support:
+            tabulate(formula, self.max_table_support, self.max_table_memory)
+        return bool(self._solve(formula, self._prepare(formula, assignments)))
+
+    def _solve_sat(self, formula, assignments):  # formulas with only ∃ after prenexing are plain SAT
+        self.model = None
+        if not self.sat or any(isinstance(node, QuantifierNode) and node.quantifier != QuantifierType.EXISTS
+                               for node in postorder(formula)):
+            return None
+        blocks, matrix = prenex(formula)
+        if any(quantifier != QuantifierType.EXISTS for quantifier, _ in blocks):
+            return None
+        self._prepare(formula, assignments)
+        solver = SatSolver()
+        tseitin = Tseitin({bit.id: solver.new_var() for _, variables in blocks for bit in variables})
+        _encode(solver, tseitin, matrix)
+        if not solver.solve([tseitin.variables[bit_id] * (1 if value else -1)
+                             for bit_id, value in (assignments or dict()).items() if bit_id in tseitin.variables]):
+            return False
+        self.model = {bit.id: solver.model[tseitin.variables[bit.id]] for _, variables in blocks for bit in variables}
+        return True
+
+    def _prepare(self, formula, assignments):
         if assignments is None:
             assignments = dict()
+        bits, bound = dict(), set()
+        for node in postorder(formula):
+            if isinstance(node, BitNode):
+                bits[node.id] = node
+            elif isinstance(node, QuantifierNode):
+                bound.update(variable.id for variable in node.variables)
+        for bit_id, bit in bits.items():
+            if bit_id not in bound and bit_id not in assignments:
+                raise SuckError(f'{bit} cannot be evaluated from assignments {assignments}')
+        size = max([*bits, *bound, *assignments], default=-1) + 1
+        values = bytearray([UNASSIGNED]) * size
+        for bit_id, value in assignments.items():
+            values[bit_id] = bool(value)
+        self.vectors = [0] * size
+        self.memo.clear()
+        self.projections.clear()
+        self.evaluators.clear()
+        return values
 
-        if isinstance(formula, BitNode):
-            if formula.id not in assignments:
-                raise SuckError(f'{formula} cannot be evaluated from assignments {assignments}')
-            return assignments[formula.id]
+    def _projection(self, formula):
+        projection = self.projections.get(id(formula))
+        if projection is None:
+            support = sorted(free_variables(formula))
+            projection = itemgetter(*support) if support else lambda assignments: ()
+            self.projections[id(formula)] = projection
+        return projection
 
-        if isinstance(formula, ConstantNode):
-            return formula.value
+    def _vector_kernel(self, formula):
+        return compile_formula(formula.child, vectorized=True) if self.parallel_bits else None
 
-        if isinstance(formula, QuantifierNode):
-            if formula.quantifier == QuantifierType.EXISTS:
-                result = False
-                for mask in range(2 ** len(formula.variables)):
-                    for i, variable in enumerate(formula.variables):
-                        if variable.id in assignments:
-                            raise SuckError(f'detected nested quantifiers by {variable}')
-                        assignments[variable.id] = bool((mask >> i) & 1)
-                    result |= self.solve(formula.child, assignments)
-                    for variable in formula.variables:
-                        del assignments[variable.id]
-                    if result:
-                        break
-                return result
-            if formula.quantifier == QuantifierType.FORALL:
-                result = True
-                for mask in range(2 ** len(formula.variables)):
-                    for i, variable in enumerate(formula.variables):
-                        if variable.id in assignments:
-                            raise SuckError(f'detected nested quantifiers by {variable}')
-                        assignments[variable.id] = bool((mask >> i) & 1)
-                    result &= self.solve(formula.child, assignments)
-                    for variable in formula.variables:
-                        del assignments[variable.id]
-                    if not result:
-                        break
-                return result
-            if formula.quantifier == QuantifierType.EXISTS_UNIQUE:
-                cnt_ok = 0
-                for mask in range(2 ** len(formula.variables)):
-                    for i, variable in enumerate(formula.variables):
-                        if variable.id in assignments:
-                            raise SuckError(f'detected nested quantifiers by {variable}')
-                        assignments[variable.id] = bool((mask >> i) & 1)
-                    cnt_ok += self.solve(formula.child, assignments)
-                    for variable in formula.variables:
-                        del assignments[variable.id]
-                    if cnt_ok >= 2:
-                        break
-                return cnt_ok == 1
-            raise SuckError(f'Unknown quantifier type {formula.quantifier}')
+    def _num_masks(self, formula):  # the first parallel_bits bits are not enumerated if the body has a vector kernel
+        if self._vector_kernel(formula) is not None:
+            return 2 ** max(0, len(formula.variables) - self.parallel_bits)
+        return 2 ** len(formula.variables)
+
+    def _count(self, formula, assignments, masks, stop=None):  # counts satisfying assignments until decided
+        kernel = self._vector_kernel(formula)
+        cnt_ok, cnt_fail = 0, 0
+        if kernel is not None:
+            low, high = formula.variables[:self.parallel_bits], formula.variables[self.parallel_bits:]
+            patterns, full = truth_table_patterns(len(low))
+            block = {variable.id for variable in formula.variables}
+            vectors = self.vectors
+            for bit_id in kernel.inputs:
+                if bit_id not in block:
+                    if assignments[bit_id] == UNASSIGNED:
+                        raise SuckError(f'x{bit_id} cannot be evaluated outside of its quantifier')
+                    vectors[bit_id] = -assignments[bit_id]
+            for variable, pattern in zip(low, patterns):
+                vectors[variable.id] = pattern
+            for mask in masks:
+                for i, variable in enumerate(high):
+                    vectors[variable.id] = -((mask >> i) & 1)
+                value = (kernel(vectors) & full).bit_count()
+                self.stats.nodes_visited += 1
+                cnt_ok += value
+                cnt_fail += (1 << len(low)) - value
+                if _decided(formula.quantifier, cnt_ok, cnt_fail) or stop is not None and stop.is_set():
+                    break
+            return cnt_ok, cnt_fail
+        if self.gray_code:
+            return (yield from self._count_gray_code(formula, assignments, masks, stop))
+        kernel = compile_formula(formula.child)
+        for mask in masks:
+            for i, variable in enumerate(formula.variables):
+                assignments[variable.id] = (mask >> i) & 1
+            if kernel is not None:
+                self.stats.nodes_visited += 1
+                value = kernel(assignments)
+            else:
+                value = yield formula.child
+            if value:
+                cnt_ok += 1
+            else:
+                cnt_fail += 1
+            if _decided(formula.quantifier, cnt_ok, cnt_fail) or stop is not None and stop.is_set():
+                break
+        for variable in formula.variables:
+            assignments[variable.id] = UNASSIGNED
+        return cnt_ok, cnt_fail
+
+    def _count_gray_code(self, formula, assignments, masks, stop):  # k-th step assigns k ^ (k >> 1)
+        evaluator = self.evaluators.get(id(formula))
+        if evaluator is None:
+            evaluator = self.evaluators[id(formula)] = _GrayCodeEvaluator(formula.child)
+        cnt_ok, cnt_fail = 0, 0
+        for k in masks:
+            if k == masks.start:
+                for i, variable in enumerate(formula.variables):
+                    assignments[variable.id] = ((k ^ (k >> 1)) >> i) & 1
+                value = yield from evaluator.reset(assignments)
+            else:
+                variable = formula.variables[(k & -k).bit_length() - 1]
+                assignments[variable.id] ^= 1
+                value = yield from evaluator.flip(variable.id, assignments)
+            if value:
+                cnt_ok += 1
+            else:
+                cnt_fail += 1
+            if _decided(formula.quantifier, cnt_ok, cnt_fail) or stop is not None and stop.is_set():
+                break
+        for variable in formula.variables:
+            assignments[variable.id] = UNASSIGNED
+        return cnt_ok, cnt_fail
 
+    def _search(self, formula, kernel, assignments):  # prunes blocks decided by a prefix, depth first over the bits
+        variables, n = formula.variables, len(formula.variables)
+        cnt_ok, cnt_fail = 0, 0
+        i = 0  # the first i bits of the block are assigned
+        while True:
+            is_true, is_false = kernel(assignments)
+            if (is_true or is_false) and i < n:
+                self.stats.pruned += 1
+            if is_true:
+                cnt_ok += 2 ** (n - i)
+            elif is_false:
+                cnt_fail += 2 ** (n - i)
+            elif i < n:
+                assignments[variables[i].id] = 0
+                i += 1
+                continue
+            elif (yield formula.child):
+                cnt_ok += 1
+            else:
+                cnt_fail += 1
+            decided = _decided(formula.quantifier, cnt_ok, cnt_fail)
+            while i > 0 and (decided or assignments[variables[i - 1].id] == 1):  # backtrack to the last 0
+                i -= 1
+                assignments[variables[i].id] = UNASSIGNED
+            if i == 0:
+                return cnt_ok, cnt_fail
+            assignments[variables[i - 1].id] = 1
+
+    def _block(self, formula, assignments):  # a generator counting the assignments of the block of a quantifier
+        if self.partial_evaluation and not self.gray_code and self._vector_kernel(formula) is None:
+            return self._search(formula, compile_ternary(formula.child), assignments)
+        return self._count(formula, assignments, range(self._num_masks(formula)))
+
+    def _solve(self, formula: Formula, assignments):
+        self.stats.nodes_visited += 1
+        kernel = compile_formula(formula)
+        if kernel is not None:
+            return kernel(assignments)
+        return self._run(self._evaluate(formula, assignments), assignments)
+
+    def _run(self, generator, assignments):  # an explicit stack, so that nested quantifiers do not recurse
+        stack = [generator]  # generators yield the subformulas they need and are sent their values
+        value = None
+        while True:
+            try:
+                child = stack[-1].send(value)
+            except StopIteration as stop:
+                stack.pop()
+                if not stack:
+                    return stop.value
+                value = stop.value
+                continue
+            self.stats.nodes_visited += 1
+            kernel = compile_formula(child)
+            if kernel is not None:
+                value = kernel(assignments)
+            else:
+                value = None
+                stack.append(self._evaluate(child, assignments))
+
+    def _evaluate(self, formula, assignments):  # the generator of a node without a kernel
+        if isinstance(formula, QuantifierNode):
+            return self._evaluate_quantifier(formula, assignments)
         if isinstance(formula, OperationNode):
+            return self._evaluate_operation(formula, assignments)
+        raise SuckError(f'Unknown node type {type(formula)}')
+
+    def _evaluate_quantifier(self, formula, assignments):
+        if self.memo_size:
+            key = id(formula), self._projection(formula)(assignments)
+            if key in self.memo:
+                self.stats.cache_hits += 1
+                self.memo.move_to_end(key)
+                return self.memo[key]
+            self.stats.cache_misses += 1
+        for variable in formula.variables:
+            if assignments[variable.id] != UNASSIGNED:
+                raise SuckError(f'detected nested quantifiers by {variable}')
+        self.stats.enter(formula)
+        cnt_ok, cnt_fail = yield from self._block(formula, assignments)
+        result = _result(formula.quantifier, cnt_ok, cnt_fail)
+        if cnt_ok + cnt_fail < 2 ** len(formula.variables):
+            self.stats.early_exits += 1
+        self.stats.exit(result, cnt_ok, cnt_fail)
+        if self.memo_size:
+            self.memo[key] = result
+            if len(self.memo) > self.memo_size:
+                self.memo.popitem(last=False)
+        return result
+
+    def _evaluate_operation(self, formula, assignments):  # frames for the quantified skeleton below the node
+        frames = [[formula, 0, _IDENTITIES.get(formula.op_type)]]  # node, index of the next child, value so far
+        value = None  # of the last evaluated child
+        while True:
+            frame = frames[-1]
+            node, i, result = frame
+            if value is not None:
+                if node.op_type == OperationType.NOT:
+                    result = not value
+                elif node.op_type == OperationType.AND:
+                    result = result and value
+                elif node.op_type == OperationType.OR:
+                    result = result or value
+                elif node.op_type == OperationType.XOR:
+                    result = result != value
+                elif node.op_type == OperationType.EQ:
+                    result = value if result is None else result == value
+                else:
+                    raise SuckError(f'Unknown operation type {node.op_type}')
+                frame[2], value = result, None
+            if i == len(node.children) or node.op_type == OperationType.AND and not result or \
+                    node.op_type == OperationType.OR and result:
+                frames.pop()
+                if not frames:
+                    return result
+                value = result
+                continue
+            frame[1] += 1
+            child = node.children[i]
+            if isinstance(child, OperationNode) and compile_formula(child) is None:
+                self.stats.nodes_visited += 1
+                frames.append([child, 0, _IDENTITIES.get(child.op_type)])
+            else:
+                value = bool((yield child))
+
+
+_worker = None
+
+
+def _init_worker(nodes, assignments, options, events, stop):
+    global _worker
+    solver = BruteForceSolver(preprocessing=False, sat=False, **options)
+    formula = deserialize(nodes)
+    if solver.max_table_support:
+        tabulate(formula, solver.max_table_support, solver.max_table_memory)
+    nodes = list(postorder(formula))
+    positions = {id(node): i for i, node in enumerate(nodes)}
+    recorded = []  # events of the current chunk, with quantifiers by position
+    if events:
+        solver.callbacks = [lambda quantifier, *event: recorded.append((positions[id(quantifier)], *event))]
+    _worker = solver, nodes, positions, solver._prepare(formula, assignments), recorded, stop
+
+
+def _count_chunk(index, start, end):  # index of the quantifier in the postorder of the formula
+    solver, nodes, positions, assignments, recorded, stop = _worker
+    recorded.clear()
+    solver.stats = SolverStats(solver.callbacks)
+    cnt_ok, cnt_fail = solver._run(solver._count(nodes[index], assignments, range(start, end), stop), assignments)
+    return cnt_ok, cnt_fail, solver.stats.export(positions), list(recorded)
+
+
+class ParallelBruteForceSolver(BruteForceSolver):  # splits the blocks of quantifiers outside of all others
+    def __init__(self, parallel_bits=16, partial_evaluation=True, preprocessing=True, sat=True, max_workers=None,
+                 chunk_size=None, gray_code=False, memo_size=2 ** 16, max_table_support=16, max_table_memory=2 ** 22,
+                 callbacks=()):  # the stats of the workers are merged and their callbacks run here, per chunk
+        super().__init__(parallel_bits=parallel_bits, partial_evaluation=partial_evaluation, memo_size=memo_size,
+                         preprocessing=preprocessing, sat=sat, max_table_support=max_table_support,
+                         max_table_memory=max_table_memory, gray_code=gray_code, callbacks=callbacks)
+        self.max_workers = max_workers or os.cpu_count()
+        self.chunk_size = chunk_size
+        self.num_chunks = 0  # sent to the processes by the last solve
+        self.executor = None
+        self.formula = None
+        self.nodes = []  # the postorder of the formula
+        self.assignments = None  # of the caller, also the free bits of the quantifiers that are split
+        self.positions = dict()
+        self.stop = None
+
+    def solve(self, formula: Formula, assignments=None):
+        self.num_chunks = 0
+        try:
+            return super().solve(formula, assignments)
+        finally:
+            if self.executor is not None:
+                self.executor.shutdown(cancel_futures=True)
+                self.executor = None
+
+    def _prepare(self, formula, assignments):
+        self.formula = formula
+        self.assignments = dict(assignments or dict())
+        self.positions.clear()
+        return super()._prepare(formula, assignments)
+
+    def _block(self, formula, assignments):  # miniscoping may leave several such quantifiers below the root
+        if free_variables(formula) <= self.assignments.keys():
+            return self._count_parallel(formula)
+        return super()._block(formula, assignments)
+
+    def _count_parallel(self, formula):  # a generator like _count, without subformulas for _run
+        if self.executor is None:
+            self.nodes = list(postorder(self.formula))
+            self.positions = {id(node): i for i, node in enumerate(self.nodes)}
+            self.stop = multiprocessing.Event()
+            options = dict(parallel_bits=self.parallel_bits, partial_evaluation=self.partial_evaluation,
+                           memo_size=self.memo_size, max_table_support=self.max_table_support,
+                           max_table_memory=self.max_table_memory, gray_code=self.gray_code)
+            initargs = serialize(self.formula), self.assignments, options, bool(self.callbacks), self.stop
+            self.executor = ProcessPoolExecutor(max_workers=self.max_workers, initializer=_init_worker,
+                                                initargs=initargs)
+        num_masks = self._num_masks(formula)
+        chunk_size = self.chunk_size or max(1, num_masks // (4 * self.max_workers))
+        self.stop.clear()
+        futures = [self.executor.submit(_count_chunk, self.positions[id(formula)], start,
+                                        min(start + chunk_size, num_masks))
+                   for start in range(0, num_masks, chunk_size)]
+        self.num_chunks += len(futures)
+        cnt_ok, cnt_fail = 0, 0
+        merged = set()
+        for future in as_completed(futures):
+            ok, fail = self._merge(future, merged)
+            cnt_ok += ok
+            cnt_fail += fail
+            if _decided(formula.quantifier, cnt_ok, cnt_fail):
+                self.stop.set()
+                for other in futures:
+                    other.cancel()
+                break
+        for future in wait(futures).done:  # the next block clears the stop, chunks cut short still count
+            if not future.cancelled() and future not in merged:
+                self._merge(future, merged)
+        return cnt_ok, cnt_fail
+        yield
+
+    def _merge(self, future, merged):
+        cnt_ok, cnt_fail, stats, events = future.result()
+        merged.add(future)
+        self.stats.merge(stats, self.nodes)
+        for position, result, seconds in events:
+            for callback in self.callbacks:
+                callback(self.nodes[position], result, seconds)
+        return cnt_ok, cnt_fail
+
+
+class CaqeSolver:
+    def __init__(self, path=CAQE_PATH, timeout=None):
+        self.path = path
+        self.timeout = timeout
+        self.certificate = None
+
+    def solve(self, formula: Formula):
+        self.certificate = None
+        with tempfile.NamedTemporaryFile('w', suffix='.qdimacs') as file:
+            encoding = to_qdimacs(formula, file)
+            file.flush()
+            try:
+                process = subprocess.run([self.path, '--qdo', file.name], capture_output=True, text=True,
+                                         timeout=self.timeout)
+            except FileNotFoundError:
+                raise SuckError(f'caqe binary not found at {self.path}, build it as described in readme.md')
+            except subprocess.TimeoutExpired:
+                raise SuckError(f'caqe did not finish in {self.timeout} seconds')
+        if process.returncode not in (10, 20):
+            raise SuckError(f'caqe exited with code {process.returncode}: {process.stderr.strip()}')
+        names = {var: bit_id for bit_id, var in encoding.variables.items()}
+        self.certificate = dict()
+        for line in process.stdout.splitlines():
+            tokens = line.split()
+            if tokens and tokens[0] == 'V' and abs(int(tokens[1])) in names:
+                self.certificate[names[abs(int(tokens[1]))]] = int(tokens[1]) > 0
+        return process.returncode == 10
+
+
+class QdpllSolver:  # search with clause and cube learning on the prenex CNF, free bits are existential
+    def __init__(self, preprocessing=True, max_learned=2000):
+        self.preprocessing = preprocessing
+        self.max_learned = max_learned
+        self.num_conflicts = 0
+        self.num_solutions = 0
+
+    def solve(self, formula: Formula):
+        self.num_conflicts = self.num_solutions = 0
+        return self._solve(preprocess(formula) if self.preprocessing else formula)
+
+    def _solve(self, formula):
+        if isinstance(formula, OperationNode) and not free_variables(formula):  # closed parts are solved apart
             if formula.op_type == OperationType.NOT:
-                return not self.solve(formula.children[0], assignments)
-            if formula.op_type == OperationType.AND:
-                result = True
-                for child in formula.children:
-                    result &= self.solve(child, assignments)
-                    if not result:
-                        break
-                return result
-            if formula.op_type == OperationType.OR:
-                result = False
-                for child in formula.children:
-                    result |= self.solve(child, assignments)
-                    if result:
-                        break
-                return result
-            if formula.op_type == OperationType.XOR:
-                result = False
-                for child in formula.children:
-                    result ^= self.solve(child, assignments)
-                return result
-            if formula.op_type == OperationType.EQ:
-                return self.solve(formula.children[0], assignments) == \
-                    self.solve(formula.children[1], assignments)
-            raise SuckError(f'Unknown operation type {formula.op_type}')
+                return not self._solve(formula.children[0])
+            if formula.op_type in (OperationType.AND, OperationType.OR):
+                short = formula.op_type == OperationType.OR
+                return short if any(self._solve(child) == short for child in formula.children) else not short
+        encoding = QdimacsEncoding(formula)
+        search = Qdpll(encoding.num_vars, encoding.prefix, encoding.clauses(), encoding.gates, self.max_learned)
+        result = search.solve()
+        self.num_conflicts += search.num_conflicts
+        self.num_solutions += search.num_solutions
+        return result
 
-        raise SuckError(f'Unknown node type {type(formula)}')
+
+class BddSolver:  # builds the ROBDD of the whole formula, free bits are existential
+    def __init__(self, node_limit=None, cache_size=2**16, reordering=True, preprocessing=True):
+        self.node_limit = node_limit
+        self.cache_size = cache_size
+        self.reordering = reordering
+        self.preprocessing = preprocessing
+        self.bdd = None
+
+    def solve(self, formula: Formula):
+        if self.preprocessing:
+            formula = preprocess(formula)
+        self.bdd = Bdd(node_limit=self.node_limit, cache_size=self.cache_size, reordering=self.reordering)
+        return to_bdd(self.bdd, formula) != FALSE
+
+
+def _encode(solver, tseitin, formula):  # asserts the formula in the SAT solver
+    for clause in tseitin.encode(formula):
+        solver.add_clause(clause)
+    solver.add_clause([tseitin.literal(formula)])
+
+
+class CegarSolver:  # two-level prefixes by counterexample-guided abstraction refinement, others go to fallback
+    def __init__(self, preprocessing=True, fallback=None):
+        self.preprocessing = preprocessing
+        self.fallback = QdpllSolver(preprocessing=False) if fallback is None else fallback
+        self.num_refinements = 0
+
+    def solve(self, formula: Formula):
+        self.num_refinements = 0
+        if self.preprocessing:
+            formula = preprocess(formula)
+        blocks, matrix = prenex(formula)
+        if len(blocks) > 2:
+            return self.fallback.solve(formula)
+        if len(blocks) == 1:
+            blocks.append((QuantifierType.FORALL if blocks[0][0] == QuantifierType.EXISTS else
+                           QuantifierType.EXISTS, []))
+        outer, inner = [variables for _, variables in blocks] if blocks else ([], [])
+        if blocks and blocks[0][0] == QuantifierType.FORALL:  # ∀X ∃Y φ == ¬∃X ∀Y ¬φ
+            return not self._exists_forall(outer, inner, ~matrix)
+        return self._exists_forall(outer, inner, matrix)
+
+    def _exists_forall(self, outer, inner, matrix):
+        check, abstraction = SatSolver(), SatSolver()
+        check_tseitin = Tseitin({bit.id: check.new_var() for bit in outer + inner})
+        tseitin = Tseitin({bit.id: abstraction.new_var() for bit in outer})
+        _encode(check, check_tseitin, ~matrix)
+        instances = []  # Tseitin caches literals by id(), so instances must stay alive
+        while abstraction.solve():
+            candidate = [check_tseitin.variables[bit.id] * (1 if abstraction.model[tseitin.variables[bit.id]] else -1)
+                         for bit in outer]
+            if not check.solve(candidate):
+                return True
+            self.num_refinements += 1
+            counterexample = {bit.id: ConstantNode(bool(check.model[check_tseitin.variables[bit.id]]))
+                              for bit in inner}
+            instances.append(simplify(substitute(matrix, counterexample, rename=False)))
+            _encode(abstraction, tseitin, instances[-1])
+        return False
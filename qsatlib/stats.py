@@ -0,0 +1,74 @@
+import time
+from collections import Counter
+
+from qsatlib.qsatlib import *
+
+
+class SolverStats:  # counters of one solve, per-quantifier counters are keyed by id() of the node
+    def __init__(self, callbacks=()):
+        self.callbacks = list(callbacks)  # callback(quantifier, result, seconds) after every evaluated quantifier
+        self.nodes_visited = 0  # evaluated nodes, a kernel call counts once
+        self.early_exits = 0  # quantifier loops that stopped once the result was decided
+        self.pruned = 0  # blocks decided by partial evaluation of a prefix
+        self.cache_hits = 0  # quantifiers answered from the memo
+        self.cache_misses = 0
+        self.quantifiers = dict()  # keeps the nodes alive, so that their ids stay unique
+        self.calls = Counter()
+        self.branches = Counter()  # assignments of the block decided
+        self.seconds = Counter()  # including nested quantifiers
+        self.self_seconds = Counter()  # excluding nested quantifiers
+        self._frames = []  # [quantifier, start, seconds of nested quantifiers]
+
+    def enter(self, quantifier: QuantifierNode):
+        self.quantifiers[id(quantifier)] = quantifier
+        self.calls[id(quantifier)] += 1
+        self._frames.append([quantifier, time.perf_counter(), 0.0])
+
+    def exit(self, result, cnt_ok, cnt_fail):
+        quantifier, start, nested = self._frames.pop()
+        seconds = time.perf_counter() - start
+        self.branches[id(quantifier)] += cnt_ok + cnt_fail
+        self.seconds[id(quantifier)] += seconds
+        self.self_seconds[id(quantifier)] += seconds - nested
+        if self._frames:
+            self._frames[-1][2] += seconds
+        for callback in self.callbacks:
+            callback(quantifier, result, seconds)
+
+    def export(self, positions):  # picklable counters, a quantifier is given as positions[id(quantifier)]
+        return dict(nodes_visited=self.nodes_visited, early_exits=self.early_exits, pruned=self.pruned,
+                    cache_hits=self.cache_hits, cache_misses=self.cache_misses,
+                    quantifiers={positions[key]: (self.calls[key], self.branches[key], self.seconds[key],
+                                                  self.self_seconds[key]) for key in self.quantifiers})
+
+    def merge(self, exported, nodes):  # adds the counters of another process, nodes[position] is the quantifier
+        self.nodes_visited += exported['nodes_visited']
+        self.early_exits += exported['early_exits']
+        self.pruned += exported['pruned']
+        self.cache_hits += exported['cache_hits']
+        self.cache_misses += exported['cache_misses']
+        for position, (calls, branches, seconds, self_seconds) in exported['quantifiers'].items():
+            key = id(nodes[position])
+            self.quantifiers[key] = nodes[position]
+            self.calls[key] += calls
+            self.branches[key] += branches
+            self.seconds[key] += seconds
+            self.self_seconds[key] += self_seconds
+
+    def by_provenance(self):  # construct -> [self seconds, calls, branches], untagged nodes under None
+        rows = dict()
+        for key, quantifier in self.quantifiers.items():
+            row = rows.setdefault(provenance(quantifier), [0.0, 0, 0])
+            row[0] += self.self_seconds[key]
+            row[1] += self.calls[key]
+            row[2] += self.branches[key]
+        return rows
+
+    def report(self, limit=20):
+        lines = [f'{self.nodes_visited} nodes visited, {self.early_exits} early exits, {self.pruned} pruned blocks, '
+                 f'{self.cache_hits} cache hits, {self.cache_misses} cache misses',
+                 f'{"construct":40} {"seconds":>10} {"calls":>10} {"branches":>12}']
+        rows = sorted(self.by_provenance().items(), key=lambda item: item[1][0], reverse=True)
+        for name, (seconds, calls, branches) in rows[:limit]:
+            lines.append(f'{name or "(top level)":40} {seconds:10.4f} {calls:10} {branches:12}')
+        return '\n'.join(lines)
@@ -0,0 +1,35 @@
+import random
+
+from qsatlib.aig import Aig, FALSE, TRUE, to_aig
+from qsatlib.compiler import compile_formula
+from qsatlib.graphs import *
+from util import random_formula
+
+
+def test_aig_hashing():
+    aig = Aig()
+    x, y = aig.input(0), aig.input(1)
+    assert aig.and_(x, y) == aig.and_(y, x) and aig.num_gates == 1
+    assert aig.and_(x, x ^ 1) == FALSE and aig.and_(x, TRUE) == x and aig.or_(x, TRUE) == TRUE
+    gates = [aig.and_(aig.input(i), aig.input(i + 1)) for i in range(1000)]
+    assert gates == [aig.and_(aig.input(i + 1), aig.input(i)) for i in range(1000)]
+    assert aig.num_gates == 1000 and len(aig) == 1 + 1001 + 1000
+
+
+def test_to_aig():
+    rng = random.Random(3)
+    for _ in range(200):
+        bits = [BitNode() for _ in range(4)]
+        formula = random_formula(rng, bits, 4, constants=True, max_arity=3)
+        aig = to_aig(formula)
+        kernel = compile_formula(formula)
+        for mask in range(2 ** 4):
+            values = {bit.id: (mask >> i) & 1 for i, bit in enumerate(bits)}
+            assert aig.evaluate(aig.outputs[0], values) == bool(kernel(values))
+
+    a = DirectedGraph(num_vertices=3)
+    b = DirectedGraph(num_vertices=3)
+    aig = to_aig(forall(a, exist(b, (a & b) == b)))
+    prefix = [(quantifier, [aig.bit_ids[node] for node in nodes]) for quantifier, nodes in aig.prefix]
+    assert prefix[0] == (QuantifierType.FORALL, [bit.id for bit in a.bits])
+    assert prefix[1][0] == QuantifierType.EXISTS and {bit.id for bit in b.bits} <= set(prefix[1][1])
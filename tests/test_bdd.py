@@ -0,0 +1,58 @@
+import itertools
+import random
+
+import pytest
+
+from qsatlib.bdd import Bdd, FALSE, TRUE, to_bdd
+from qsatlib.graphs import *
+from qsatlib.numbers import *
+from qsatlib.error import SuckError
+from qsatlib.solver import BddSolver
+from util import random_formula, random_prenex_formulas
+
+
+def test_bdd_canonical():
+    bdd = Bdd()
+    x, y = BitNode(), BitNode()
+    f = to_bdd(bdd, ~(x & y))
+    assert f == to_bdd(bdd, ~x | ~y)
+    assert to_bdd(bdd, x ^ x) == FALSE
+    assert to_bdd(bdd, (x == y) ^ (x ^ y)) == TRUE
+    assert to_bdd(bdd, exist_unique(Variable(num_bits=0), x)) == to_bdd(bdd, x)
+
+
+def test_bdd_sift():
+    rng = random.Random(0)
+    bits = [BitNode() for _ in range(6)]
+    bdd = Bdd(reordering=False)
+    roots = [to_bdd(bdd, random_formula(rng, bits, 6)) for _ in range(5)]
+    tables = [[bdd.evaluate(root, dict(zip([bit.id for bit in bits], values)))
+               for values in itertools.product((False, True), repeat=len(bits))] for root in roots]
+    size = bdd.size(roots)
+    assert bdd.sift(roots) <= size
+    assert tables == [[bdd.evaluate(root, dict(zip([bit.id for bit in bits], values)))
+                       for values in itertools.product((False, True), repeat=len(bits))] for root in roots]
+
+
+def test_bdd_solver():
+    for formula, expected in random_prenex_formulas(1, 200, block_size=2, quantifiers=list(QuantifierType)):
+        assert BddSolver(preprocessing=False).solve(formula) == expected
+        assert BddSolver(cache_size=7).solve(formula) == expected
+
+    n = 4
+    a = UIntUnary(num_bits=n)
+    b = UIntUnary(num_bits=n)
+    c = UIntUnary(num_bits=n)
+    assert BddSolver().solve(forall(a, b, c, (a + b) + c == a + (b + c)))
+
+    a = DirectedGraph(num_vertices=n)
+    b = DirectedGraph(num_vertices=n)
+    assert BddSolver().solve(forall(a, b, (a & b) == (b & a)))
+
+
+def test_bdd_node_limit():
+    n = 8
+    a = UIntBinary(num_bits=n)
+    b = UIntBinary(num_bits=n)
+    with pytest.raises(SuckError):
+        BddSolver(node_limit=100).solve(forall(a, b, a * b == b * a))
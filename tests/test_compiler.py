@@ -0,0 +1,81 @@
+import gc
+
+from qsatlib import compiler
+from qsatlib.qsatlib import *
+from qsatlib.numbers import UIntBinary
+from qsatlib.compiler import compile_formula, compile_ternary, tabulate, truth_table_patterns
+
+
+def test_compile_formula():
+    a = Variable(num_bits=3)
+    b = Variable(num_bits=3)
+    formula = implies(a == b, xor(a[0], b[0], a[2]) | ~eq(a[1], b[1], ConstantNode(True)))
+    kernel = compile_formula(formula)
+    assert kernel is compile_formula(formula)
+    assert kernel.inputs == tuple(sorted(bit.id for bit in a.bits + b.bits))
+    for mask in range(2 ** 6):
+        assignments = {bit.id: bool((mask >> i) & 1) for i, bit in enumerate(a.bits + b.bits)}
+        x = [assignments[bit.id] for bit in a.bits]
+        y = [assignments[bit.id] for bit in b.bits]
+        expected = x != y or (x[0] ^ y[0] ^ x[2]) or not (y[1] == x[1] and x[1])
+        assert kernel(assignments) == expected
+
+    assert compile_formula(exist(a, a == b)) is None
+    assert compile_formula(ConstantNode(False))(dict()) is False
+
+
+def test_compile_vectorized():
+    a = Variable(num_bits=3)
+    b = Variable(num_bits=2)
+    formula = (a[0] & ~b[1]) == xor(a[1], a[2], b[0], ConstantNode(True))
+    kernel = compile_formula(formula, vectorized=True)
+    patterns, full = truth_table_patterns(5)
+    value = kernel({bit.id: pattern for bit, pattern in zip(a.bits + b.bits, patterns)}) & full
+    scalar = compile_formula(formula)
+    for mask in range(2 ** 5):
+        assignments = {bit.id: bool((mask >> i) & 1) for i, bit in enumerate(a.bits + b.bits)}
+        assert bool((value >> mask) & 1) == scalar(assignments)
+
+
+def test_tabulate():
+    a = UIntBinary(num_bits=3)
+    b = UIntBinary(num_bits=3)
+    c = Variable(num_bits=6)
+    formula = ((a < b) | c[0]) & xor(a[0], *c.bits)
+    bits = a.bits + b.bits + c.bits
+    patterns, full = truth_table_patterns(len(bits))
+    table = compile_formula(formula, vectorized=True)({bit.id: pattern for bit, pattern in zip(bits, patterns)})
+    assert tabulate(formula, max_support=7, max_memory=0) == 0
+    assert tabulate(formula, max_support=7) > 0
+    assert getattr(formula, '_table', None) is None and formula.children[0]._table is not None
+    kernel = compile_formula(formula)
+    for mask in range(0, 2 ** 12, 7):
+        assignments = {bit.id: (mask >> i) & 1 for i, bit in enumerate(bits)}
+        assert bool(kernel(assignments)) == bool((table >> mask) & 1)
+
+
+def test_tabulate_total_memory(monkeypatch):  # tables live on shared nodes, so their total is bounded too
+    a = UIntBinary(num_bits=4)
+    b = UIntBinary(num_bits=4)
+    monkeypatch.setattr(compiler, 'MAX_TABLE_MEMORY', (compiler.table_bits + 2 ** 8) / 8)
+    formula = (a < b) | (b < a)
+    assert tabulate(formula) == 1  # a table over 8 bits fills the limit
+    assert tabulate((a == b) | a[0]) == 0
+    del formula
+    gc.collect()
+    assert tabulate((a == b) | a[0]) == 1
+
+
+def test_compile_ternary():
+    with FormulaContext():
+        a = Variable(num_bits=2)
+        b = Variable(num_bits=2)
+    kernel = compile_ternary(implies(a == b, exist(b, a != b) | a[0]))
+    assert tuple(map(bool, kernel(bytearray([0, 0, 2, 2])))) == (False, False)
+    assert tuple(map(bool, kernel(bytearray([0, 0, 1, 2])))) == (True, False)
+    assert tuple(map(bool, kernel(bytearray([0, 0, 0, 0])))) == (False, False)
+    assert tuple(map(bool, kernel(bytearray([1, 0, 2, 2])))) == (True, False)
+    kernel = compile_ternary(xor(a[0], a[1]) == ~b[0])
+    assert tuple(map(bool, kernel(bytearray([1, 2, 1, 2])))) == (False, False)
+    assert tuple(map(bool, kernel(bytearray([1, 1, 1, 2])))) == (True, False)
+    assert tuple(map(bool, kernel(bytearray([1, 0, 1, 2])))) == (False, True)
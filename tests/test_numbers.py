@@ -505,3 +505,61 @@ def test_binary_bit_dist():
     c = UIntBinary(num_bits=n)
     formula = forall(a, b, c, a | (b & c) == (a | b) & (a | c))
     assert solver.solve(formula)
+
+
+def test_reuse_operations():
+    n = 3
+    solver = BruteForceSolver()
+
+    def num_quantified(formula):
+        return sum(len(node.variables) for node in postorder(formula) if isinstance(node, QuantifierNode))
+
+    sizes = []
+    for reuse_operations in (False, True):
+        with FormulaContext(reuse_operations=reuse_operations):
+            a = UIntBinary(num_bits=n)
+            b = UIntBinary(num_bits=n)
+            assert (a + b is a + b) == reuse_operations
+            formula = forall(a, b, (a + b) * (a + b) == (a + b) * (a + b))
+            assert solver.solve(formula)
+            sizes.append(num_quantified(formula))
+
+            # a consumed result has its bits bound inside the consumer, so it is not handed out again
+            product = a * b
+            double = product + product
+            assert a * b is not product
+            assert solver.solve(forall(a, b, double == a * b + a * b))
+    assert sizes[1] < sizes[0]
+
+
+def test_binary_arithmetic():
+    solver = BruteForceSolver()
+
+    def constant(variable, value):
+        return conj(*[variable[i] if (value >> i) & 1 else ~variable[i] for i in range(len(variable))])
+
+    operations = [  # (bits, operation, expected value), division by zero gives all ones and the dividend
+        (3, lambda a, b: a - b, lambda x, y: (x - y) % 8),
+        (2, lambda a, b: a // b, lambda x, y: x // y if y else 3),
+        (2, lambda a, b: a % b, lambda x, y: x % y if y else x),
+        (3, lambda a, b: a << 1, lambda x, y: (x << 1) % 8),
+        (3, lambda a, b: a >> 2, lambda x, y: x >> 2),
+    ]
+    for n, build, expected in operations:
+        for x in range(2 ** n):
+            for y in range(2 ** n):
+                a = UIntBinary(num_bits=n)
+                b = UIntBinary(num_bits=n)
+                c = UIntBinary(num_bits=n)
+                inputs = constant(a, x) & constant(b, y) & (build(a, b) == c)
+                assert solver.solve(exist(a, b, c, inputs & constant(c, expected(x, y))))
+                assert not solver.solve(exist(a, b, c, inputs & ~constant(c, expected(x, y))))
+
+    n = 4
+    for x in range(2 ** n):
+        for y in range(2 ** n):
+            a = UIntBinary(num_bits=n)
+            b = UIntBinary(num_bits=n)
+            inputs = constant(a, x) & constant(b, y)
+            for relation, value in ((a < b, x < y), (a <= b, x <= y), (a > b, x > y), (a >= b, x >= y)):
+                assert solver.solve(exist(a, b, inputs & (relation if value else ~relation)))
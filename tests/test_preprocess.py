@@ -0,0 +1,106 @@
+import random
+
+from qsatlib.numbers import *
+from qsatlib.preprocess import eliminate_definitions, miniscope, node_count, preprocess, simplify, sweep
+from qsatlib.solver import BruteForceSolver
+from util import random_formula
+
+
+def num_quantified(formula):
+    return sum(len(node.variables) for node in postorder(formula) if isinstance(node, QuantifierNode))
+
+
+def test_eliminate_definitions():
+    n = 2
+    solver = BruteForceSolver(preprocessing=False)
+
+    a = UIntBinary(num_bits=n)
+    b = UIntBinary(num_bits=n)
+    formula = forall(a, b, a + b == b + a)
+    simplified = eliminate_definitions(formula)
+    assert num_quantified(simplified) == 2 * n
+    assert solver.solve(simplified)
+
+    a = UIntBinary(num_bits=n)
+    b = UIntBinary(num_bits=n)
+    c = UIntBinary(num_bits=n)
+    formula = forall(a, b, exist_unique(c, c == a * b))
+    simplified = eliminate_definitions(formula)
+    assert num_quantified(simplified) == 2 * n
+    assert solver.solve(simplified)
+
+    # Cyclic definitions keep one of the bits
+    a = Variable(num_bits=1)
+    b = Variable(num_bits=1)
+    formula = exist(a, b, (a[0] == ~b[0]) & (b[0] == ~a[0]))
+    simplified = eliminate_definitions(formula)
+    assert num_quantified(simplified) == 1
+    assert solver.solve(simplified)
+
+    a = Variable(num_bits=1)
+    b = Variable(num_bits=1)
+    formula = exist_unique(a, b, (a[0] == b[0]) & (b[0] == ~a[0]))
+    simplified = eliminate_definitions(formula)
+    assert num_quantified(simplified) == 1
+    assert not solver.solve(simplified)
+
+
+def test_simplify(caplog):
+    a = Variable(num_bits=3)
+    b = Variable(num_bits=3)
+    x, y, z = a.bits
+    assert simplify(~~x & ConstantNode(True)) is x
+    assert simplify(conj(x, conj(y, z), x)) is conj(x, y, z)
+    assert simplify(x & (x | y)) is x
+    assert simplify(x & ~x | z) is z
+    assert simplify(xor(x, y, ~x)) is ~y
+    assert simplify((x == x) & (y == ~y).__invert__()) is ConstantNode(True)
+    assert simplify(~x == ~y) is (x == y)
+    assert simplify(exist(b, a[0] | ConstantNode(True))) is ConstantNode(True)
+    assert simplify(exist_unique(b, a == a)) is ConstantNode(False)
+    with caplog.at_level('INFO', logger='qsatlib.preprocess'):
+        simplify(forall(a, a[2] == a[2]))
+    assert 'nodes to 1' in caplog.text
+
+
+def test_miniscope():
+    def blocks(formula):
+        return sorted(len(node.variables) for node in postorder(formula) if isinstance(node, QuantifierNode))
+
+    a = Variable(num_bits=2)
+    b = Variable(num_bits=2)
+    c = Variable(num_bits=2)
+    x, y, z = a[0], b[0], c[0]
+
+    assert blocks(miniscope(exist(a, b, c, (a[0] | a[1]) & (b[0] == b[1]) & z))) == [1, 1, 1, 2]
+    assert blocks(miniscope(exist(a, b, c, (a[0] == b[0]) & (b[1] | c[1]) & ~a[1] & ~(b[1] == z)))) == [1, 2, 3]
+    assert simplify(miniscope(forall(a, implies(x, y) & z))) is (y | ~QuantifierNode(QuantifierType.EXISTS, [x], x)) & z
+    assert simplify(miniscope(exist(a, ~x | y))) is ~QuantifierNode(QuantifierType.FORALL, [x], x) | y
+    assert miniscope(exist_unique(a, x)) is ConstantNode(False)
+
+    solver = BruteForceSolver(preprocessing=False)
+    for n in range(1, 3):
+        a = UIntBinary(num_bits=n)
+        b = UIntBinary(num_bits=n)
+        c = UIntBinary(num_bits=n)
+        formula = forall(a, b, c, implies((a <= b) & (b <= c), a <= c))
+        assert solver.solve(miniscope(formula))
+        formula = forall(a, exist(b, implies(a < c, b == c)))
+        assert solver.solve(forall(c, miniscope(formula))) == solver.solve(forall(c, formula))
+
+
+def test_sweep():
+    n = 4
+    a = UIntBinary(num_bits=n)
+    b = UIntBinary(num_bits=n)
+    formula = simplify((a <= b) ^ ~(b < a))  # equivalent constructions of <=
+    assert node_count(formula) > 10 and str(simplify(sweep(formula))) == '0'
+
+    rng = random.Random(4)
+    solver = BruteForceSolver(preprocessing=False)
+    for _ in range(100):
+        bits = [BitNode() for _ in range(5)]
+        formula = QuantifierNode(QuantifierType.FORALL, bits[:2], QuantifierNode(
+            QuantifierType.EXISTS, bits[2:], random_formula(rng, bits, 6, quantifiers=0.1)))
+        swept = sweep(formula, width=4)  # narrow signatures, so that proofs fail and counterexamples are used
+        assert solver.solve(swept) == solver.solve(formula) == solver.solve(preprocess(formula, sweeping=True))
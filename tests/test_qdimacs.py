@@ -0,0 +1,112 @@
+import io
+
+from qsatlib.graphs import *
+from qsatlib.numbers import *
+from qsatlib.qdimacs import to_qdimacs
+from qsatlib.solver import BruteForceSolver
+
+
+def parse_qdimacs(text):
+    lines = text.splitlines()
+    _, _, num_vars, num_clauses = lines[0].split()
+    prefix, clauses = [], []
+    for line in lines[1:]:
+        tokens = line.split()
+        assert tokens[-1] == '0'
+        if tokens[0] in ('e', 'a'):
+            prefix.append((tokens[0], list(map(int, tokens[1:-1]))))
+        else:
+            clauses.append(list(map(int, tokens[:-1])))
+    assert len(clauses) == int(num_clauses)
+    return int(num_vars), prefix, clauses
+
+
+def propagate(clauses, assignment):
+    changed = True
+    while changed:
+        changed = False
+        for clause in clauses:
+            if any(assignment.get(abs(x)) == (x > 0) for x in clause):
+                continue
+            free = [x for x in clause if abs(x) not in assignment]
+            if not free:
+                return False
+            if len(free) == 1:
+                assignment[free[0] if free[0] > 0 else -free[0]] = free[0] > 0
+                changed = True
+    return True
+
+
+def evaluate(text, num_inputs):  # auxiliary Tseitin variables are implied by unit propagation
+    _, prefix, clauses = parse_qdimacs(text)
+    order = [(quantifier, variable) for quantifier, variables in prefix
+             for variable in variables if variable <= num_inputs]
+
+    def search(i, assignment):
+        if i == len(order):
+            return propagate(clauses, dict(assignment))
+        quantifier, variable = order[i]
+        result = quantifier != 'e'
+        for value in (False, True):
+            assignment[variable] = value
+            if search(i + 1, assignment) != result:
+                result = not result
+                break
+        del assignment[variable]
+        return result
+
+    return search(0, dict())
+
+
+def check(formula):
+    stream = io.StringIO()
+    encoding = to_qdimacs(formula, stream)
+    num_vars, prefix, clauses = parse_qdimacs(stream.getvalue())
+    assert num_vars == encoding.num_vars
+    assert all(quantifier != other for (quantifier, _), (other, _) in zip(prefix, prefix[1:]))
+    assert sorted(sum([variables for _, variables in prefix], [])) == list(range(1, num_vars + 1))
+    assert all(0 < abs(x) <= num_vars for clause in clauses for x in clause)
+    expected = BruteForceSolver().solve(formula)
+    assert evaluate(stream.getvalue(), len(encoding.variables)) == expected
+    return expected
+
+
+def test_qdimacs_quantifiers():
+    n = 2
+
+    a = Variable(num_bits=n)
+    b = Variable(num_bits=n)
+    assert check(forall(a, exist_unique(b, b == a)))
+
+    a = Variable(num_bits=n)
+    b = Variable(num_bits=n)
+    assert not check(forall(a, exist_unique(b, b != a)))
+
+    a = Variable(num_bits=n)
+    b = Variable(num_bits=n)
+    assert check(exist(a, forall(b, a == b)) == ConstantNode(False))
+
+    a = Variable(num_bits=n)
+    b = Variable(num_bits=n)
+    inner = exist(b, a != b)
+    assert check(forall(a, inner & ~~inner))
+
+
+def test_qdimacs_numbers():
+    n = 2
+
+    a = UIntBinary(num_bits=n)
+    b = UIntBinary(num_bits=n)
+    assert not check(forall(a, exist(b, a == b + b)))
+
+    a = UIntUnary(num_bits=n)
+    b = UIntUnary(num_bits=n)
+    assert check(forall(a, b, a + b == b + a))
+
+
+def test_qdimacs_graphs():
+    n = 2
+
+    a = DirectedGraph(num_vertices=n)
+    b = DirectedGraph(num_vertices=n)
+    assert check(forall(a, b, (a & b).has_edge(0, 1) == a.has_edge(0, 1) & b.has_edge(0, 1)))
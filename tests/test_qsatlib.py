@@ -1,3 +1,8 @@
+import pickle
+import threading
+
+from qsatlib.numbers import UIntBinary
+from qsatlib.preprocess import preprocess
 from qsatlib.qsatlib import *
 from qsatlib.solver import BruteForceSolver
 
@@ -50,3 +55,116 @@ def test_variable_equality():
     c = Variable(num_bits=n)
     formula = forall(a, b, c, implies((a == b) & (b != c), a != c))
     assert solver.solve(formula)
+
+
+def test_hash_consing():
+    a = Variable(num_bits=2)
+    b = Variable(num_bits=2)
+    assert (a == b) is (a == b)
+    assert conj() is ConstantNode(True)
+    assert exist(a, a != b) is exist(a, a != b)
+    assert (a[0] & b[0]) is not (b[0] & a[0])
+    assert not hasattr(a == b, '__dict__')
+
+
+def test_formula_context():
+    with FormulaContext() as context:
+        a = Variable(num_bits=3)
+        with FormulaContext():
+            b = Variable(num_bits=2)
+        c = Variable(num_bits=1)
+    assert [bit.id for bit in a.bits + c.bits] == [0, 1, 2, 3]
+    assert [bit.id for bit in b.bits] == [0, 1]
+    assert context.num_bits == 4
+    context.reset()
+    assert context.new_id() == 0
+
+    context = FormulaContext()
+
+    def build():
+        with context:
+            for _ in range(1000):
+                BitNode()
+
+    threads = [threading.Thread(target=build) for _ in range(4)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    assert context.num_bits == 4000
+
+
+def test_serialize():
+    a = Variable(num_bits=2)
+    b = Variable(num_bits=2)
+    formula = forall(a, exist_unique(b, (a != b) ^ ConstantNode(True)))
+    assert str(deserialize(serialize(formula))) == str(formula)
+
+
+def test_pickle_after_solve():  # compiled kernels and tables on shared nodes are not pickled
+    a = UIntBinary(num_bits=3)
+    b = UIntBinary(num_bits=3)
+    formula = forall(a, exist(b, (a < b) | ConstantNode(True)))
+    assert BruteForceSolver(preprocessing=False).solve(formula)
+    assert BruteForceSolver().solve(forall(a, b, a + b == b + a))
+    copy = pickle.loads(pickle.dumps(formula))
+    assert str(copy) == str(formula) and free_variables(copy) == frozenset()
+    assert BruteForceSolver(preprocessing=False).solve(copy)
+
+
+def test_deep_formula():
+    bits = [BitNode() for _ in range(3)]
+    y = BitNode()
+    formula, plain = bits[0], bits[0]
+    for i in range(3000):
+        op_type = OperationType.XOR if i % 2 else OperationType.OR
+        formula = OperationNode(op_type, formula, QuantifierNode(QuantifierType.EXISTS, [y], y & bits[i % 3]))
+        plain = OperationNode(op_type, plain, bits[i % 3])
+    assert str(formula).count('∃') == 3000
+    for quantifier in (QuantifierType.EXISTS, QuantifierType.FORALL):
+        expected = BruteForceSolver(preprocessing=False).solve(QuantifierNode(quantifier, bits, plain))
+        assert BruteForceSolver(preprocessing=False, sat=False).solve(QuantifierNode(quantifier, bits,
+                                                                                    formula)) == expected
+
+
+def test_deep_nesting():  # the solver keeps its own stack for nested quantifiers and block bits
+    for innermost in (QuantifierNode(QuantifierType.EXISTS, [y := BitNode()], y),
+                      QuantifierNode(QuantifierType.EXISTS_UNIQUE, [BitNode()], ConstantNode(True))):
+        formula = innermost
+        for i in range(500):  # every level equals the next one
+            bit = BitNode()
+            if i % 2:
+                formula = QuantifierNode(QuantifierType.FORALL, [bit], bit | formula)
+            else:
+                formula = QuantifierNode(QuantifierType.EXISTS, [bit], ~bit & formula)
+        expected = innermost.quantifier == QuantifierType.EXISTS
+        for options in (dict(), dict(partial_evaluation=False), dict(gray_code=True)):
+            assert BruteForceSolver(preprocessing=False, **options).solve(formula) == expected
+
+    a = UIntBinary(num_bits=1)
+    b = UIntBinary(num_bits=1)
+    c = a
+    for _ in range(300):  # every sum wraps the previous one in ∃
+        c = c + b
+    formula = forall(a, b, c == a)
+    assert BruteForceSolver(preprocessing=False).solve(formula)
+    assert BruteForceSolver(preprocessing=False, partial_evaluation=False).solve(formula)
+
+
+def test_provenance():
+    a = UIntBinary(num_bits=2)
+    b = UIntBinary(num_bits=2)
+    c = a * b
+    assert provenance(c.constraint) == 'UIntBinary.__mul__'
+    assert provenance(a < b) == 'UIntBinary.__lt__'
+    assert provenance(xor(a[1], b[0], a[0])) is None  # nodes keep the construct that created them first
+    simplified = preprocess(forall(a, b, (a < b) | (b < a)))  # rewritten nodes keep the construct
+    assert sum(provenance(node) == 'UIntBinary.__lt__' for node in postorder(simplified)) >= 2
+
+
+def test_free_variables():
+    a = Variable(num_bits=2)
+    b = Variable(num_bits=2)
+    formula = exist(a, a == b) & b[0]
+    assert free_variables(formula) == {bit.id for bit in b.bits}
+    assert free_variables(forall(b, formula)) == frozenset()
@@ -0,0 +1,45 @@
+import itertools
+import random
+
+from qsatlib.sat import SatSolver, luby
+
+
+def satisfiable(num_vars, clauses, assumptions=()):
+    for values in itertools.product((False, True), repeat=num_vars):
+        if all(values[abs(lit) - 1] == (lit > 0) for lit in assumptions) and \
+                all(any(values[abs(lit) - 1] == (lit > 0) for lit in clause) for clause in clauses):
+            return True
+    return False
+
+
+def test_sat_random():
+    rng = random.Random(0)
+    for _ in range(300):
+        num_vars = rng.randint(1, 8)
+        clauses = [[rng.choice((-1, 1)) * rng.randint(1, num_vars) for _ in range(rng.randint(1, 3))]
+                   for _ in range(rng.randint(1, 5 * num_vars))]
+        solver = SatSolver(restart_interval=1, max_learned=4) if rng.random() < 0.5 else SatSolver()
+        for clause in clauses:
+            solver.add_clause(clause)
+        for _ in range(3):  # incremental calls keep learned clauses and accept assumptions
+            assumptions = [rng.choice((-1, 1)) * rng.randint(1, num_vars) for _ in range(rng.randint(0, 3))]
+            result = solver.solve(assumptions)
+            assert result == satisfiable(num_vars, clauses, assumptions)
+            if result:
+                assert all(any(solver.model[abs(lit)] == (lit > 0) for lit in clause) for clause in clauses)
+                assert all(solver.model[abs(lit)] == (lit > 0) for lit in assumptions)
+        assert solver.solve() == satisfiable(num_vars, clauses)
+
+
+def test_sat_pigeonhole():
+    assert [luby(i) for i in range(15)] == [1, 1, 2, 1, 1, 2, 4, 1, 1, 2, 1, 1, 2, 4, 8]
+    n = 6
+    solver = SatSolver(restart_interval=10, max_learned=50)
+    holes = [[solver.new_var() for _ in range(n)] for _ in range(n + 1)]
+    for pigeon in holes:
+        solver.add_clause(pigeon)
+    for hole in range(n):
+        for first, second in itertools.combinations(range(n + 1), 2):
+            solver.add_clause([-holes[first][hole], -holes[second][hole]])
+    assert not solver.solve()
+    assert solver.num_restarts > 0 and solver.num_deleted > 0
@@ -0,0 +1,236 @@
+import os
+import random
+
+import pytest
+
+from qsatlib.graphs import *
+from qsatlib.numbers import *
+from qsatlib.error import SuckError
+from qsatlib.solver import BddSolver, BruteForceSolver, CaqeSolver, CegarSolver, ParallelBruteForceSolver, \
+    QdpllSolver, CAQE_PATH
+from util import random_formula, random_prenex_formulas
+
+
+@pytest.mark.skipif(not os.path.exists(CAQE_PATH), reason='caqe is not built')
+def test_caqe():
+    n = 3
+    solver = CaqeSolver(timeout=60)
+
+    # Odd numbers
+    a = UIntBinary(num_bits=n)
+    b = UIntBinary(num_bits=n)
+    formula = forall(a, exist(b, a == b + b))
+    assert not solver.solve(formula)
+
+    # Minimum, with the witness in the certificate
+    a = UIntBinary(num_bits=n)
+    b = UIntBinary(num_bits=n)
+    formula = exist(a, forall(b, b >= a))
+    assert solver.solve(formula)
+    assert not any(solver.certificate[bit.id] for bit in a.bits)
+
+    # Commutativity
+    a = UIntBinary(num_bits=n)
+    b = UIntBinary(num_bits=n)
+    formula = forall(a, b, a * b == b * a)
+    assert solver.solve(formula)
+
+
+def test_caqe_missing_binary():
+    a = Variable(num_bits=1)
+    with pytest.raises(SuckError):
+        CaqeSolver(path='/nonexistent/caqe').solve(exist(a, a == a))
+
+
+def test_scoped_context():  # fresh bits of the solvers must not clash with the bits of the formula
+    with FormulaContext():
+        a = Variable(num_bits=2)
+        b = Variable(num_bits=2)
+        formula = forall(a, exist_unique(b, b == a))
+    solvers = [BruteForceSolver(), BruteForceSolver(preprocessing=False), QdpllSolver(),
+               QdpllSolver(preprocessing=False), BddSolver(preprocessing=False), CegarSolver(preprocessing=False),
+               ParallelBruteForceSolver(preprocessing=False, max_workers=2)]
+    if os.path.exists(CAQE_PATH):
+        solvers.append(CaqeSolver(timeout=60))
+    for solver in solvers:
+        with FormulaContext():
+            assert solver.solve(formula)
+        assert solver.solve(formula)
+
+
+def test_brute_force_options():
+    n = 3
+    for parallel_bits, partial_evaluation, gray_code in ((0, False, False), (0, True, False), (1, False, False),
+                                                        (16, True, False), (0, True, True), (1, False, True)):
+        solver = BruteForceSolver(parallel_bits=parallel_bits, partial_evaluation=partial_evaluation,
+                                  gray_code=gray_code)
+
+        a = Variable(num_bits=n)
+        b = Variable(num_bits=n)
+        assert solver.solve(forall(a, exist_unique(b, b == a)))
+
+        a = Variable(num_bits=n)
+        b = Variable(num_bits=n)
+        assert not solver.solve(forall(a, exist_unique(b, b != a)))
+
+        a = UIntBinary(num_bits=n)
+        b = UIntBinary(num_bits=n)
+        assert solver.solve(exist(a, forall(b, b >= a)))
+        assert not solver.solve(forall(a, exist(b, a == b + b)))
+
+
+def test_brute_force_sat():
+    n = 6
+    solver = BruteForceSolver()
+
+    a = UIntBinary(num_bits=n)
+    b = UIntBinary(num_bits=n)
+    assert solver.solve(exist(a, b, (a * b == b + b) & (a != b) & b[n - 1]))
+    values = [[solver.model[bit.id] for bit in variable.bits] for variable in (a, b)]
+    assert values[0] != values[1] and values[1][n - 1]
+
+    a = Variable(num_bits=n)
+    b = Variable(num_bits=n)
+    assignments = {bit.id: i % 2 == 0 for i, bit in enumerate(a.bits)}
+    assert solver.solve(exist(b, b == a), assignments)
+    assert all(solver.model[bit.id] == (i % 2 == 0) for i, bit in enumerate(b.bits))
+    assert solver.solve(exist(b, ~exist(Variable(num_bits=1), b != a)), assignments)
+    assert solver.model is None  # ¬∃ is universal, so this is not SAT
+    assert not solver.solve(exist(a, b, (a == b) & (a != b)))
+    with pytest.raises(SuckError):
+        solver.solve(exist(b, b == a))
+
+
+def test_parallel_brute_force():
+    n = 3
+    for parallel_bits, gray_code in ((0, False), (2, False), (0, True)):
+        solver = ParallelBruteForceSolver(parallel_bits=parallel_bits, max_workers=2, chunk_size=3,
+                                          gray_code=gray_code)
+        raw = ParallelBruteForceSolver(parallel_bits=parallel_bits, preprocessing=False, max_workers=2,
+                                       chunk_size=3, gray_code=gray_code)  # preprocessing solves these two
+
+        a = Variable(num_bits=n)
+        b = Variable(num_bits=n)
+        assert raw.solve(forall(a, exist_unique(b, b == a)))
+        assert raw.num_chunks > 0
+
+        a = Variable(num_bits=n)
+        assert not raw.solve(exist_unique(a, a[0] | a[1]))
+        assert raw.num_chunks > 0
+
+        a = UIntBinary(num_bits=n)
+        b = UIntBinary(num_bits=n)
+        assert solver.solve(exist(a, forall(b, b >= a)))
+        assert solver.num_chunks > 0
+        assert not solver.solve(forall(a, exist(b, a == b + b)))
+        assert solver.num_chunks > 0
+        assert solver.solve(forall(a, b, a + b == b + a))  # miniscoping splits it into a conjunction
+        assert solver.num_chunks > 0
+
+        c = Variable(num_bits=n)
+        assignments = {bit.id: i % 2 for i, bit in enumerate(c.bits)}
+        assert not solver.solve(exist(a, a == c) & forall(b, b != c), assignments)
+        assert solver.num_chunks > 0
+
+
+def test_brute_force_memo():
+    n = 3
+    a = Variable(num_bits=n)
+    b = Variable(num_bits=n)
+    c = Variable(num_bits=n)
+    formula = forall(a, c, exist(b, (b != a) & b[0]))
+    solver = BruteForceSolver(parallel_bits=0, memo_size=4, preprocessing=False)
+    assert solver.solve(formula)
+    assert solver.stats.cache_hits > 0 and solver.stats.cache_misses > 0 and len(solver.memo) <= 4
+    assert solver.solve(formula) == BruteForceSolver(memo_size=0).solve(formula)
+
+
+def test_brute_force_stats():
+    n = 3
+    a = UIntBinary(num_bits=n)
+    b = UIntBinary(num_bits=n)
+    events = []
+    solver = BruteForceSolver(parallel_bits=0, preprocessing=False, callbacks=[lambda *event: events.append(event)])
+    assert not solver.solve(forall(a, exist(b, a == b + b)))
+    stats = solver.stats
+    assert stats.nodes_visited > 0 and stats.early_exits > 0
+    assert len(events) == sum(stats.calls.values())
+    rows = stats.by_provenance()
+    assert rows['UIntBinary.__add__'][1] > 0 and rows[None][1] > 0
+    assert 'UIntBinary.__add__' in stats.report()
+
+    events.clear()
+    solver = ParallelBruteForceSolver(parallel_bits=0, preprocessing=False, max_workers=2, chunk_size=2,
+                                      callbacks=[lambda *event: events.append(event)])
+    for _ in range(2):  # the stats of the workers are merged, and reset by every solve
+        assert not solver.solve(forall(a, exist(b, a == b + b)))
+        stats = solver.stats
+        assert stats.nodes_visited > 0 and stats.cache_misses > 0
+        assert len(events) == sum(stats.calls.values())
+        assert stats.by_provenance()['UIntBinary.__add__'][1] > 0
+        events.clear()
+    solver = ParallelBruteForceSolver(parallel_bits=0, preprocessing=False, max_workers=2, memo_size=0)
+    assert not solver.solve(forall(a, exist(b, a == b + b)))
+    assert solver.stats.nodes_visited > 0 and solver.stats.cache_misses == 0
+
+
+def test_brute_force_gray_code():
+    rng = random.Random(2)
+    solver = BruteForceSolver(parallel_bits=0, preprocessing=False, gray_code=True)
+    for _ in range(100):
+        bits = [BitNode() for _ in range(6)]
+        formula = random_formula(rng, bits, 5)
+        rng.shuffle(bits)
+        formula = QuantifierNode(rng.choice(list(QuantifierType)), bits[:3], formula)
+        formula = OperationNode(rng.choice([OperationType.AND, OperationType.OR, OperationType.XOR]), formula,
+                                random_formula(rng, bits[3:], 3))
+        formula = QuantifierNode(rng.choice(list(QuantifierType)), bits[3:], formula)
+        expected = BruteForceSolver(parallel_bits=0, partial_evaluation=False, preprocessing=False).solve(formula)
+        assert solver.solve(formula) == expected
+
+
+def test_qdpll():
+    n = 3
+    solver = QdpllSolver()
+
+    a = Variable(num_bits=n)
+    b = Variable(num_bits=n)
+    assert solver.solve(forall(a, exist_unique(b, b == a)))
+
+    a = UIntBinary(num_bits=n)
+    b = UIntBinary(num_bits=n)
+    assert solver.solve(exist(a, forall(b, b >= a)))
+    assert not solver.solve(forall(a, exist(b, a == b + b)))
+    assert solver.solve(forall(a, b, a * b == b * a))
+    assert solver.num_conflicts + solver.num_solutions > 0
+
+    for formula, expected in random_prenex_formulas(0, 200, block_size=2):
+        assert QdpllSolver(preprocessing=False).solve(formula) == expected
+        assert QdpllSolver(preprocessing=False, max_learned=2).solve(formula) == expected
+        assert solver.solve(formula) == expected
+
+    a = DirectedGraph(num_vertices=5)  # 100 universal bits, cubes only keep the bits that decide the matrix
+    b = DirectedGraph(num_vertices=5)
+    assert solver.solve(forall(a, b, (a | (a & b)) == a))
+    assert solver.num_solutions < 100
+
+
+def test_cegar():
+    n = 6
+    solver = CegarSolver()
+
+    a = UIntBinary(num_bits=n)
+    b = UIntBinary(num_bits=n)
+    assert solver.solve(exist(a, forall(b, b >= a)))
+    assert not solver.solve(forall(a, exist(b, a == b + b)))
+    assert solver.solve(forall(a, exist(b, b >= a)))
+
+    a = Variable(num_bits=2)
+    b = Variable(num_bits=2)
+    fallback = CegarSolver(preprocessing=False)
+    assert fallback.solve(forall(a, exist_unique(b, b == a)))  # ∃! prenexes to three levels
+    assert fallback.num_refinements == 0
+
+    for formula, expected in random_prenex_formulas(1, 200, block_size=3):
+        assert CegarSolver(preprocessing=False).solve(formula) == expected
+        assert solver.solve(formula) == expected
@@ -0,0 +1,30 @@
+import random
+
+from qsatlib.qsatlib import *
+from qsatlib.solver import BruteForceSolver
+
+
+def random_formula(rng, bits, depth, constants=False, max_arity=2, quantifiers=0.0):
+    if depth == 0 or rng.random() < 0.2:
+        leaf = rng.choice(bits + [ConstantNode(rng.random() < 0.5)] if constants else bits)
+        return ~leaf if rng.random() < 0.5 else leaf
+    if rng.random() < quantifiers:  # over a fresh bit
+        bit = BitNode()
+        return QuantifierNode(rng.choice(list(QuantifierType)), [bit],
+                              random_formula(rng, bits + [bit], depth - 1, constants, max_arity, quantifiers))
+    op_type = rng.choice(list(OperationType))
+    arity = 1 if op_type == OperationType.NOT else 2 if op_type == OperationType.EQ else rng.randint(2, max_arity)
+    return OperationNode(op_type, *[random_formula(rng, bits, depth - 1, constants, max_arity, quantifiers)
+                                    for _ in range(arity)])
+
+
+def random_prenex_formulas(seed, count, block_size, quantifiers=(QuantifierType.EXISTS, QuantifierType.FORALL),
+                           num_bits=6, depth=5):  # (formula, result of BruteForceSolver)
+    rng = random.Random(seed)
+    for _ in range(count):
+        bits = [BitNode() for _ in range(num_bits)]
+        formula = random_formula(rng, bits, depth)
+        rng.shuffle(bits)
+        for i in range(0, num_bits, block_size):
+            formula = QuantifierNode(rng.choice(quantifiers), bits[i:i + block_size], formula)
+        yield formula, BruteForceSolver().solve(formula)